@@ -0,0 +1,125 @@
+"""
+Расписание врачей: рабочие часы, занятые интервалы и поиск свободного времени.
+
+Занятые интервалы врача на день хранятся отсортированными по началу вместе с
+префиксным максимумом концов, поэтому проверка пересечения — один бинарный
+поиск, O(log n), даже если в старых данных интервалы накладываются.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from django.utils.timezone import make_aware
+
+from users.models import DoctorWorkingHours
+from .models import AppointmentService
+
+
+class DoctorSchedule:
+    """Занятость одного врача в пределах одного дня."""
+
+    def __init__(self, doctor_id, day, busy, working_windows=None):
+        self.doctor_id = doctor_id
+        self.day = day
+        busy = sorted(busy)
+        self._starts = [start for start, _ in busy]
+        self._ends = [end for _, end in busy]
+        # _max_ends[i] — самый поздний конец среди первых i + 1 интервалов
+        self._max_ends = list(accumulate(self._ends, max))
+        # None — у врача вообще не заданы рабочие часы, он доступен весь день;
+        # пустой список — в этот день недели врач не работает
+        self.working_windows = [_day_bounds(day)] if working_windows is None else sorted(working_windows)
+        self._window_starts = [start for start, _ in self.working_windows]
+
+    @property
+    def busy(self):
+        return list(zip(self._starts, self._ends))
+
+    def conflicts(self, start, end):
+        """Пересекается ли интервал [start, end) с уже занятым временем"""
+        idx = bisect_left(self._starts, end)
+        # интервалы [0, idx) начинаются раньше end; пересечение есть,
+        # если хотя бы один из них заканчивается позже start
+        return idx > 0 and self._max_ends[idx - 1] > start
+
+    def within_working_hours(self, start, end):
+        """Укладывается ли интервал целиком в одно рабочее окно"""
+        idx = bisect_right(self._window_starts, start) - 1
+        if idx < 0:
+            return False
+        window_start, window_end = self.working_windows[idx]
+        return window_start <= start and end <= window_end
+
+    def is_available(self, start, end):
+        return self.within_working_hours(start, end) and not self.conflicts(start, end)
+
+    def free_windows(self):
+        """Свободные промежутки внутри рабочих окон"""
+        free = []
+        busy = self.busy
+        for window_start, window_end in self.working_windows:
+            cursor = window_start
+            # интервалы до idx заканчиваются не позже начала окна
+            idx = bisect_right(self._max_ends, window_start)
+            for start, end in busy[idx:]:
+                if start >= window_end:
+                    break
+                if end <= cursor:
+                    continue
+                if start > cursor:
+                    free.append((cursor, start))
+                cursor = max(cursor, end)
+            if cursor < window_end:
+                free.append((cursor, window_end))
+        return free
+
+    def free_slots(self, duration):
+        """Начала свободных слотов длительностью duration (timedelta)"""
+        slots = []
+        for start, end in self.free_windows():
+            slot = start
+            while slot + duration <= end:
+                slots.append(slot)
+                slot += duration
+        return slots
+
+
+def _day_bounds(day):
+    start = make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def load_schedules(doctor_ids, day):
+    """
+    Расписания врачей на день: один запрос за рабочими часами
+    и один индексный запрос за занятыми интервалами.
+    """
+    doctor_ids = set(doctor_ids)
+    day_start, day_end = _day_bounds(day)
+
+    # часы за всю неделю: врач без единой записи доступен всегда,
+    # а с записями только на другие дни в этот день не работает
+    windows = {doctor_id: None for doctor_id in doctor_ids}
+    for hours in DoctorWorkingHours.objects.filter(doctor_id__in=doctor_ids):
+        day_windows = windows[hours.doctor_id]
+        if day_windows is None:
+            day_windows = windows[hours.doctor_id] = []
+        if hours.weekday == day.weekday():
+            day_windows.append((
+                make_aware(datetime.combine(day, hours.start_time)),
+                make_aware(datetime.combine(day, hours.end_time)),
+            ))
+
+    busy = {doctor_id: [] for doctor_id in doctor_ids}
+    bookings = (
+        AppointmentService.objects
+        .filter(doctor_id__in=doctor_ids, starts_at__lt=day_end, ends_at__gt=day_start)
+        .values_list("doctor_id", "starts_at", "ends_at")
+    )
+    for doctor_id, start, end in bookings:
+        busy[doctor_id].append((start, end))
+
+    return {
+        doctor_id: DoctorSchedule(doctor_id, day, busy[doctor_id], windows[doctor_id])
+        for doctor_id in doctor_ids
+    }
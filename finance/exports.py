@@ -0,0 +1,227 @@
+"""
+Потоковая выгрузка счетов и приёмов в CSV и XLSX.
+
+Строки читаются из базы порциями через QuerySet.iterator() и сразу уходят
+клиенту через StreamingHttpResponse, поэтому выгрузка за год не держит всё
+в памяти и начинает отдаваться сразу, а не после сборки файла.
+
+XLSX собирается без сторонних библиотек: это zip из нескольких XML-файлов,
+лист пишется в архив построчно, а готовые сжатые байты забираются из буфера
+после каждой строки.
+"""
+import csv
+import re
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.timezone import localtime
+
+from users.models import display_name
+from .models import AppointmentService
+
+CHUNK_SIZE = 2000
+
+INVOICE_HEADER = [
+    "Счёт", "Выставлен", "Статус", "Оплачен", "Кассир", "Сумма счёта",
+    "Приём", "Дата приёма", "Пациент", "Телефон", "Услуга", "Врач", "Цена", "Цена по прейскуранту",
+]
+APPOINTMENT_HEADER = [
+    "Приём", "Дата приёма", "Пациент", "Телефон", "Услуг", "Сумма", "Счёт", "Статус счёта",
+]
+
+
+def _moment(value):
+    return localtime(value).strftime("%Y-%m-%d %H:%M") if value else ""
+
+
+def invoice_rows(invoices, catalog):
+    """
+    Заголовок и по строке на каждую услугу счёта (счёт без услуг — одна строка).
+    Рядом с ценой в счёте — цена по прейскуранту на время услуги из истории цен
+    в снимке каталога (service.catalog).
+    """
+    yield INVOICE_HEADER
+    invoices = (
+        invoices
+        .select_related("appointment__patient__user", "confirmed_by")
+        .prefetch_related(Prefetch(
+            "appointment__services",
+            queryset=AppointmentService.objects.select_related("service", "doctor__user").order_by("id"),
+        ))
+    )
+    for invoice in invoices.iterator(chunk_size=CHUNK_SIZE):
+        appt = invoice.appointment
+        patient = appt.patient.user if appt else None
+        head = [
+            invoice.id, _moment(invoice.created_at), invoice.get_status_display(),
+            _moment(invoice.paid_at), display_name(invoice.confirmed_by), invoice.total_amount,
+            appt.id if appt else "", _moment(appt.appointment_date) if appt else "",
+            display_name(patient), patient.phone if patient else "",
+        ]
+        items = appt.services.all() if appt else []
+        if not items:
+            yield head + ["", "", "", ""]
+        for item in items:
+            list_price = catalog.price_at(item.service_id, item.starts_at or appt.appointment_date)
+            yield head + [
+                item.service.name, display_name(item.doctor.user if item.doctor else None), item.price,
+                "" if list_price is None else list_price,
+            ]
+
+
+def appointment_rows(appointments):
+    """Заголовок и по строке на приём с числом услуг, суммой и статусом счёта"""
+    yield APPOINTMENT_HEADER
+    appointments = (
+        appointments
+        .with_totals()
+        .with_service_count()
+        .select_related("patient__user", "invoice_link")
+    )
+    for appt in appointments.iterator(chunk_size=CHUNK_SIZE):
+        invoice = getattr(appt, "invoice_link", None)
+        yield [
+            appt.id, _moment(appt.appointment_date), display_name(appt.patient.user), appt.patient.user.phone,
+            appt.service_count, appt.total_cost,
+            invoice.id if invoice else "", invoice.get_status_display() if invoice else "",
+        ]
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+# начало ячейки, с которого Excel и другие таблицы читают формулу
+_FORMULA_START = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    """
+    Текст из базы (имя, телефон, название услуги), похожий на формулу, таблица
+    выполнила бы при открытии выгрузки — апостроф в начале делает его текстом.
+    Числа не трогаем: отрицательная сумма остаётся числом.
+    """
+    if isinstance(value, str) and value.startswith(_FORMULA_START):
+        return "'" + value
+    return value
+
+
+def csv_stream(rows):
+    # BOM — чтобы Excel открыл UTF-8 с кириллицей без мастера импорта
+    yield "\ufeff"
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+class _ZipBuffer:
+    """Файл без seek для zipfile: записанные байты забираются методом drain()"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+# символы, недопустимые в XML 1.0
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, datetime):
+        value = _moment(value)
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_stream(rows, sheet="Лист1"):
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content.format(sheet=escape(sheet, {'"': "&quot;"})))
+        with archive.open("xl/worksheets/sheet1.xml", "w") as worksheet:
+            worksheet.write(_SHEET_HEAD.encode())
+            for row in rows:
+                worksheet.write(("<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>").encode())
+                data = buffer.drain()
+                if data:
+                    yield data
+            worksheet.write(_SHEET_TAIL.encode())
+    yield buffer.drain()
+
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def streaming_response(rows, fmt, basename, sheet="Лист1"):
+    """StreamingHttpResponse с файлом basename.<fmt> для скачивания"""
+    content = xlsx_stream(rows, sheet) if fmt == "xlsx" else csv_stream(rows)
+    response = StreamingHttpResponse(content, content_type=FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{basename}.{fmt}"'
+    return response
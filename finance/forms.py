@@ -1,22 +1,109 @@
-from .models import Appointment
-from users.models import DoctorProfile
-from service.models import Room
+from .models import Invoice
 from django import forms
+from django.utils.timezone import localdate
+from datetime import timedelta
 
 
-class AppointmentForm(forms.ModelForm):
-    class Meta:
-        model = Appointment
-        fields = ['services', 'doctor', 'room', 'appointment_date', 'status']
+class DateInput(forms.DateInput):
+    input_type = 'date'
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['doctor'].queryset = DoctorProfile.objects.all()
 
-        if 'services' in self.data:
-            try:
-                service_ids = self.data.getlist('services')
-                doctors = DoctorProfile.objects.filter(services__id__in=service_ids).distinct()
-                self.fields['doctor'].queryset = doctors
-            except (ValueError, TypeError):
-                pass
+class InvoiceFilterForm(forms.Form):
+    """
+    Фильтры списка счетов: статус, диапазон дат выставления и пациент.
+    """
+    status = forms.ChoiceField(
+        label="Статус",
+        choices=[("", "Все")] + Invoice.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'border p-2 rounded'}),
+    )
+    date_from = forms.DateField(
+        label="С",
+        required=False,
+        widget=DateInput(attrs={'class': 'border p-2 rounded'}),
+    )
+    date_to = forms.DateField(
+        label="По",
+        required=False,
+        widget=DateInput(attrs={'class': 'border p-2 rounded'}),
+    )
+    patient = forms.CharField(
+        label="Пациент",
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'border p-2 rounded', 'placeholder': 'Имя или телефон'}),
+    )
+
+    def filter(self, invoices):
+        """Применить к queryset счетов все корректно заполненные фильтры"""
+        self.is_valid()
+        data = self.cleaned_data
+
+        if data.get("status"):
+            invoices = invoices.filter(status=data["status"])
+        invoices = invoices.created_between(data.get("date_from"), data.get("date_to"))
+        if data.get("patient"):
+            invoices = invoices.for_patient(data["patient"])
+        return invoices
+
+
+class ExportForm(InvoiceFilterForm):
+    """
+    Фильтры выгрузки и её формат. Для приёмов даты относятся к дате приёма,
+    статус — к статусу его счёта.
+    """
+    FORMAT_CHOICES = [
+        ("csv", "CSV"),
+        ("xlsx", "Excel (XLSX)"),
+    ]
+
+    format = forms.ChoiceField(label="Формат", choices=FORMAT_CHOICES, required=False)
+
+    def get_format(self):
+        self.is_valid()
+        return self.cleaned_data.get("format") or "csv"
+
+    def filter_appointments(self, appointments):
+        """Применить фильтры к queryset приёмов"""
+        self.is_valid()
+        data = self.cleaned_data
+
+        if data.get("status"):
+            appointments = appointments.filter(invoice_link__status=data["status"])
+        return appointments.scheduled_between(data.get("date_from"), data.get("date_to"))
+
+
+class RevenueReportForm(forms.Form):
+    """
+    Период и разрез отчёта по выручке. По умолчанию — последние 30 дней по дням.
+    """
+    GROUP_CHOICES = [
+        ("day", "По дням"),
+        ("doctor_id", "По врачам"),
+        ("service_id", "По услугам"),
+    ]
+    DEFAULT_DAYS = 30
+
+    date_from = forms.DateField(
+        label="С",
+        required=False,
+        widget=DateInput(attrs={'class': 'border p-2 rounded'}),
+    )
+    date_to = forms.DateField(
+        label="По",
+        required=False,
+        widget=DateInput(attrs={'class': 'border p-2 rounded'}),
+    )
+    group_by = forms.ChoiceField(
+        label="Разрез",
+        choices=GROUP_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'border p-2 rounded'}),
+    )
+
+    def period(self):
+        """(date_from, date_to, group_by) с подставленными значениями по умолчанию"""
+        data = self.cleaned_data if self.is_valid() else {}
+        date_to = data.get("date_to") or localdate()
+        date_from = data.get("date_from") or date_to - timedelta(days=self.DEFAULT_DAYS - 1)
+        return date_from, date_to, data.get("group_by") or "day"
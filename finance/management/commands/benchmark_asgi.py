@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils.timezone import localdate, now
+
+from finance.management.commands.benchmark_views import percentile
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузить панели параллельными клиентами через WSGI- и через ASGI-обработчик "
+        "Django (в процессе, без сервера) и сравнить пропускную способность. "
+        "Асинхронные представления (панели врача и пациента) под ASGI выполняют "
+        "независимые запросы одновременно. Данные удобно готовить командой seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16, help="Одновременных клиентов")
+        parser.add_argument("--seconds", type=float, default=3, help="Длительность прогона сценария")
+        parser.add_argument("--json", dest="json_path", help="Сохранить результат в JSON")
+
+    def _scenarios(self):
+        users = {
+            role: User.objects.filter(role=role).order_by("id").first()
+            for role in (User.ROLE_DOCTOR, User.ROLE_PATIENT, User.ROLE_CASHIER)
+        }
+        missing = [role for role, user in users.items() if user is None]
+        if missing:
+            raise CommandError(f"Нет пользователей с ролями: {', '.join(missing)}. Запустите seed_data.")
+
+        today = localdate().isoformat()
+        scenarios = [
+            ("doctor_dashboard", User.ROLE_DOCTOR, reverse("doctor_dashboard"), {}),
+            ("doctor_worklist_changes", User.ROLE_DOCTOR, reverse("doctor_worklist_changes"),
+             {"date": today, "since": now().isoformat()}),
+            ("patient_dashboard", User.ROLE_PATIENT, reverse("patient_dashboard"), {}),
+            # синхронное представление — для сравнения
+            ("cashier_dashboard", User.ROLE_CASHIER, reverse("cashier_dashboard"), {}),
+        ]
+        return users, scenarios
+
+    def _stats(self, timings, errors, seconds):
+        return {
+            "rps": round(len(timings) / seconds, 1),
+            "p50_ms": round(percentile(timings, 50), 2) if timings else 0,
+            "p95_ms": round(percentile(timings, 95), 2) if timings else 0,
+            "errors": errors,
+        }
+
+    def _run_wsgi(self, user, url, params, options):
+        deadline = time.perf_counter() + options["seconds"]
+        lock = threading.Lock()
+        timings, errors = [], [0]
+
+        def worker(client):
+            local, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    if client.get(url, params).status_code >= 400:
+                        failed += 1
+                    local.append((time.perf_counter() - start) * 1000)
+            finally:
+                connections.close_all()
+                with lock:
+                    timings.extend(local)
+                    errors[0] += failed
+
+        clients = [self._client(Client, user) for _ in range(options["clients"])]
+        threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self._stats(timings, errors[0], options["seconds"])
+
+    def _run_asgi(self, user, url, params, options):
+        timings, errors = [], [0]
+
+        async def worker(client, deadline):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if (await client.get(url, params)).status_code >= 400:
+                    errors[0] += 1
+                timings.append((time.perf_counter() - start) * 1000)
+
+        async def run(clients):
+            deadline = time.perf_counter() + options["seconds"]
+            await asyncio.gather(*(worker(client, deadline) for client in clients))
+
+        clients = [self._client(AsyncClient, user) for _ in range(options["clients"])]
+        asyncio.run(run(clients))
+        return self._stats(timings, errors[0], options["seconds"])
+
+    def _client(self, client_class, user):
+        # хост, который пропустит ALLOWED_HOSTS (при DEBUG пустой список разрешает localhost)
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        client = client_class(SERVER_NAME=host)
+        client.force_login(user)
+        return client
+
+    def handle(self, *args, **options):
+        if connections["default"].in_atomic_block:
+            # клиенты работают из других потоков и не увидели бы незакоммиченных данных
+            raise CommandError("Бенчмарк невозможен внутри транзакции.")
+        users, scenarios = self._scenarios()
+
+        results = []
+        for name, role, url, params in scenarios:
+            results.append({
+                "view": name,
+                "wsgi": self._run_wsgi(users[role], url, params, options),
+                "asgi": self._run_asgi(users[role], url, params, options),
+            })
+
+        self.stdout.write(
+            f"{'view':<26}{'WSGI rps':>10}{'ASGI rps':>10}{'WSGI p95':>10}{'ASGI p95':>10}{'errors':>8}"
+        )
+        for row in results:
+            wsgi, asgi = row["wsgi"], row["asgi"]
+            self.stdout.write(
+                f"{row['view']:<26}{wsgi['rps']:>10}{asgi['rps']:>10}{wsgi['p95_ms']:>10}{asgi['p95_ms']:>10}"
+                f"{wsgi['errors'] + asgi['errors']:>8}"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результат сохранён в {options['json_path']}"))
@@ -0,0 +1,168 @@
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction, OperationalError
+from django.test.utils import override_settings
+
+from finance.management.commands.benchmark_views import percentile
+from med_clinic import audit
+from finance.models import Appointment, Invoice
+from users.models import PatientProfile
+
+# профиль «как было»: журнал DELETE, без PRAGMA, новое соединение на каждый запрос
+BASELINE = {
+    "pragmas": {"journal_mode": "DELETE"},
+    "conn_max_age": 0,
+    "options": {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузить копию базы смешанным чтением и записью из нескольких потоков и сравнить "
+        "пропускную способность SQLite по умолчанию (baseline) и с профилем из настроек "
+        "(WAL, busy_timeout, постоянные соединения)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5, help="Длительность прогона каждого профиля")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="Доля запросов на запись")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", dest="json_path", help="Сохранить результат в JSON")
+
+    def _copy_database(self, target):
+        # backup API видит и базу в памяти (тесты), и файл в режиме WAL
+        source = connections["default"]
+        if source.in_atomic_block:
+            # незакоммиченная транзакция источника заставила бы backup ждать бесконечно
+            raise CommandError("Копирование базы невозможно внутри транзакции.")
+        source.ensure_connection()
+        destination = sqlite3.connect(target)
+        try:
+            source.connection.backup(destination)
+        finally:
+            destination.close()
+
+    def _profiles(self):
+        default = connections["default"].settings_dict
+        tuned = {
+            "pragmas": getattr(settings, "SQLITE_PRAGMAS", {}),
+            "conn_max_age": default["CONN_MAX_AGE"],
+            "options": default["OPTIONS"],
+        }
+        return [("baseline", BASELINE), ("tuned", tuned)]
+
+    def _run(self, alias, options, patient_ids):
+        deadline = time.perf_counter() + options["seconds"]
+        lock = threading.Lock()
+        stats = {"reads": 0, "writes": 0, "errors": 0, "timings": []}
+
+        def read():
+            invoices = (
+                Invoice.objects.using(alias)
+                .filter(status=Invoice.STATUS_UNPAID)
+                .select_related("appointment__patient__user")
+                .order_by("-created_at")
+            )
+            list(invoices[:25])
+            invoices.count()
+
+        def write(rng):
+            with transaction.atomic(using=alias):
+                appt = Appointment.objects.using(alias).create(patient_id=rng.choice(patient_ids))
+                Invoice.objects.using(alias).create(appointment=appt)
+
+        def worker(number):
+            rng = random.Random(options["seed"] + number)
+            local = {"reads": 0, "writes": 0, "errors": 0, "timings": []}
+            try:
+                while time.perf_counter() < deadline:
+                    is_write = rng.random() < options["write_ratio"]
+                    start = time.perf_counter()
+                    try:
+                        if is_write:
+                            write(rng)
+                        else:
+                            read()
+                        local["writes" if is_write else "reads"] += 1
+                    except OperationalError:
+                        # "database is locked"
+                        local["errors"] += 1
+                    local["timings"].append((time.perf_counter() - start) * 1000)
+                    # конец «запроса»: как request_finished, закрываем соединение, если оно не постоянное
+                    connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+                with lock:
+                    for key in ("reads", "writes", "errors"):
+                        stats[key] += local[key]
+                    stats["timings"] += local["timings"]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("Бенчмарк рассчитан на SQLite.")
+        patient_ids = list(PatientProfile.objects.values_list("id", flat=True))
+        if not patient_ids:
+            raise CommandError("В базе нет пациентов. Запустите seed_data.")
+
+        tmpdir = Path(tempfile.mkdtemp(prefix="med_clinic_bench_"))
+        results = []
+        try:
+            for name, profile in self._profiles():
+                alias = f"bench_{name}"
+                path = tmpdir / f"{name}.sqlite3"
+                self._copy_database(path)
+                connections.settings[alias] = dict(
+                    connections["default"].settings_dict,
+                    NAME=str(path),
+                    CONN_MAX_AGE=profile["conn_max_age"],
+                    OPTIONS=profile["options"],
+                )
+                try:
+                    with override_settings(SQLITE_PRAGMAS=profile["pragmas"]):
+                        stats = self._run(alias, options, patient_ids)
+                finally:
+                    # записи копии попали в журнал аудита; копия удаляется вместе с ними
+                    audit.discard(alias)
+                    del connections.settings[alias]
+
+                total = stats["reads"] + stats["writes"]
+                results.append({
+                    "profile": name,
+                    "ops_per_s": round(total / options["seconds"], 1),
+                    "reads": stats["reads"],
+                    "writes": stats["writes"],
+                    "errors": stats["errors"],
+                    "p50_ms": round(percentile(stats["timings"], 50), 2) if stats["timings"] else 0,
+                    "p95_ms": round(percentile(stats["timings"], 95), 2) if stats["timings"] else 0,
+                })
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write(f"{'profile':<12}{'ops/s':>10}{'reads':>8}{'writes':>8}{'errors':>8}{'p50, ms':>10}{'p95, ms':>10}")
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<12}{row['ops_per_s']:>10}{row['reads']:>8}{row['writes']:>8}"
+                f"{row['errors']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результат сохранён в {options['json_path']}"))
@@ -0,0 +1,112 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import localdate, now
+
+from finance.models import Invoice
+from users.models import User, DoctorProfile, PatientProfile
+
+
+def percentile(values, pct):
+    """Перцентиль методом ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогнать все панели и списки через тестовый клиент на текущей базе "
+        "и вывести p50/p95 времени ответа и число SQL-запросов. "
+        "Данные удобно готовить командой seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Замеров на страницу")
+        parser.add_argument("--warmup", type=int, default=2, help="Прогревочных запросов на страницу")
+        parser.add_argument("--json", dest="json_path", help="Сохранить результат в JSON для сравнения между коммитами")
+
+    def _scenarios(self):
+        users = {}
+        for role, _ in User.ROLE_CHOICES:
+            users[role] = User.objects.filter(role=role).order_by("id").first()
+        missing = [role for role, user in users.items() if user is None]
+        if missing:
+            raise CommandError(f"Нет пользователей с ролями: {', '.join(missing)}. Запустите seed_data.")
+
+        patient = PatientProfile.objects.order_by("-id").first()
+        doctor = DoctorProfile.objects.order_by("id").first()
+        deep_page = max(Invoice.objects.count() // 20, 1)
+        today = localdate().isoformat()
+
+        scenarios = [
+            ("manager_dashboard", User.ROLE_MANAGER, reverse("manager_dashboard"), {}),
+            ("patient_search", User.ROLE_MANAGER, reverse("patient_search"), {"q": "кар"}),
+            ("cashier_dashboard", User.ROLE_CASHIER, reverse("cashier_dashboard"), {}),
+            ("cashier_dashboard_all", User.ROLE_CASHIER, reverse("cashier_dashboard"), {"status": ""}),
+            ("invoice_list", User.ROLE_MANAGER, reverse("invoice_list"), {}),
+            ("invoice_list_deep", User.ROLE_MANAGER, reverse("invoice_list"), {"page": deep_page}),
+            ("service_list", User.ROLE_MANAGER, reverse("service_list"), {}),
+            ("catalog_services", User.ROLE_MANAGER, reverse("catalog_services"), {}),
+            ("catalog_doctors", User.ROLE_MANAGER, reverse("catalog_doctors"), {}),
+            ("doctor_dashboard", User.ROLE_DOCTOR, reverse("doctor_dashboard"), {}),
+            ("doctor_worklist_changes", User.ROLE_DOCTOR, reverse("doctor_worklist_changes"),
+             {"date": today, "since": now().isoformat()}),
+            ("patient_dashboard", User.ROLE_PATIENT, reverse("patient_dashboard"), {}),
+        ]
+        if patient:
+            scenarios.append(("appointment_create", User.ROLE_MANAGER,
+                              reverse("appointment_create", args=[patient.user_id]), {}))
+        if doctor:
+            scenarios.append(("doctor_availability", User.ROLE_MANAGER,
+                              reverse("doctor_availability", args=[doctor.id]), {"date": today}))
+        return users, scenarios
+
+    def handle(self, *args, **options):
+        users, scenarios = self._scenarios()
+        # хост, который пропустит ALLOWED_HOSTS (при DEBUG пустой список разрешает localhost)
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        clients = {}
+        for role, user in users.items():
+            client = Client(SERVER_NAME=host)
+            client.force_login(user)
+            clients[role] = client
+
+        results = []
+        for name, role, url, params in scenarios:
+            client = clients[role]
+            for _ in range(options["warmup"]):
+                client.get(url, params)
+
+            timings = []
+            queries = 0
+            for _ in range(max(options["repeat"], 1)):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = client.get(url, params)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = len(ctx.captured_queries)
+            if response.status_code >= 400:
+                raise CommandError(f"{name}: HTTP {response.status_code}")
+
+            results.append({
+                "view": name,
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "queries": queries,
+            })
+
+        self.stdout.write(f"{'view':<24}{'p50, ms':>10}{'p95, ms':>10}{'queries':>10}")
+        for row in results:
+            self.stdout.write(f"{row['view']:<24}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['queries']:>10}")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результат сохранён в {options['json_path']}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from finance.models import DailyRevenue
+
+
+class Command(BaseCommand):
+    help = "Пересобрать сводку выручки (день × врач × услуга) по всем счетам."
+
+    def handle(self, *args, **options):
+        rows = DailyRevenue.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Строк в сводке: {rows}."))
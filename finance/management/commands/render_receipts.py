@@ -0,0 +1,29 @@
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import localdate
+
+from finance.models import Invoice
+from finance.receipts import render_receipts
+
+
+class Command(BaseCommand):
+    help = (
+        "Отрисовать чеки всех счетов, оплаченных за день, у которых чеков ещё нет. "
+        "Отрисовка идёт в пуле процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="День оплаты, ГГГГ-ММ-ДД (по умолчанию сегодня)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число процессов")
+        parser.add_argument("--force", action="store_true", help="Перерисовать и уже готовые чеки")
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options["date"]) if options["date"] else localdate()
+        except ValueError:
+            raise CommandError("Неверная дата, ожидается ГГГГ-ММ-ДД.")
+
+        count = render_receipts(Invoice.objects.paid_on(day), workers=options["workers"], force=options["force"])
+        self.stdout.write(self.style.SUCCESS(f"Чеков за {day}: отрисовано {count}."))
@@ -0,0 +1,187 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import make_aware, localdate
+
+from med_clinic.data_versions import bump_data_version, SERVICE, INVOICE, APPOINTMENT_SERVICE
+from finance.models import Appointment, AppointmentService, Invoice, DailyRevenue
+from service.catalog import invalidate_catalog
+from service.models import Service, ServicePrice
+from users.models import User, DoctorProfile, PatientProfile, DoctorWorkingHours
+from users.search import rebuild_index
+
+SEED_PREFIX = "seed_"
+SEED_PASSWORD = "seed-password"
+
+FIRST_NAMES = ["Азиз", "Дилноза", "Бахтиёр", "Мадина", "Жасур", "Нилуфар", "Тимур", "Севара", "Рустам", "Камола"]
+LAST_NAMES = ["Каримов", "Юсупова", "Рахимов", "Алиева", "Турсунов", "Хасанова", "Назаров", "Исмоилова"]
+SPECIALTIES = ["Терапевт", "Кардиолог", "Невролог", "Окулист", "Хирург", "Педиатр"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполнить базу детерминированным набором данных заданного размера "
+        "(пациенты, врачи, услуги, приёмы с услугами, счета). Все записи создаются bulk-вставками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=1000)
+        parser.add_argument("--doctors", type=int, default=20)
+        parser.add_argument("--services", type=int, default=50)
+        parser.add_argument("--appointments", type=int, default=5000)
+        parser.add_argument("--max-items", type=int, default=4, help="Максимум услуг в одном приёме")
+        parser.add_argument("--paid-ratio", type=float, default=0.7, help="Доля оплаченных счетов")
+        parser.add_argument("--days", type=int, default=365, help="За сколько последних дней распределить данные")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--clear", action="store_true", help="Удалить ранее сгенерированные данные")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        today = localdate()
+        start_day = today - timedelta(days=options["days"] - 1)
+
+        def random_moment():
+            day = start_day + timedelta(days=rng.randrange(options["days"]))
+            return make_aware(datetime.combine(day, time(rng.randrange(8, 18), rng.choice((0, 15, 30, 45)))))
+
+        with transaction.atomic():
+            if options["clear"]:
+                deleted, _ = User.objects.filter(username__startswith=SEED_PREFIX).delete()
+                Service.objects.filter(name__startswith=SEED_PREFIX).delete()
+                self.stdout.write(f"Удалено старых записей: {deleted}")
+
+            # один хэш на всех — PBKDF2 на каждого пользователя сделал бы генерацию очень долгой
+            password = make_password(SEED_PASSWORD)
+            staff = [
+                User(username=f"{SEED_PREFIX}{role}", password=password, role=role,
+                     first_name=role.title(), last_name="Seed")
+                for role in (User.ROLE_MANAGER, User.ROLE_CASHIER)
+            ]
+            doctor_users = [
+                User(username=f"{SEED_PREFIX}doctor{i}", password=password, role=User.ROLE_DOCTOR,
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+                for i in range(options["doctors"])
+            ]
+            patient_users = [
+                User(username=f"{SEED_PREFIX}patient{i}", password=password, role=User.ROLE_PATIENT,
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                     phone=f"+99890{rng.randrange(10 ** 7):07d}", date_joined=random_moment())
+                for i in range(options["patients"])
+            ]
+            User.objects.bulk_create(staff + doctor_users + patient_users, batch_size=batch_size)
+            cashier = staff[1]
+
+            doctors = DoctorProfile.objects.bulk_create(
+                [
+                    DoctorProfile(user=user, specialty=rng.choice(SPECIALTIES), room=str(100 + i))
+                    for i, user in enumerate(doctor_users)
+                ],
+                batch_size=batch_size,
+            )
+            DoctorWorkingHours.objects.bulk_create(
+                [
+                    DoctorWorkingHours(doctor=doctor, weekday=weekday, start_time=time(8), end_time=time(18))
+                    for doctor in doctors
+                    for weekday in range(6)
+                ],
+                batch_size=batch_size,
+            )
+            patients = PatientProfile.objects.bulk_create(
+                [PatientProfile(user=user) for user in patient_users],
+                batch_size=batch_size,
+            )
+
+            services = Service.objects.bulk_create(
+                [
+                    Service(
+                        name=f"{SEED_PREFIX}Услуга {i:03d}",
+                        price=Decimal(rng.randrange(50, 1000) * 1000),
+                        duration_minutes=rng.choice((15, 30, 45, 60)),
+                    )
+                    for i in range(options["services"])
+                ],
+                batch_size=batch_size,
+            )
+            service_doctors = {
+                service.id: rng.sample(doctors, k=min(len(doctors), rng.randint(1, 3)))
+                for service in services
+            } if doctors else {service.id: [] for service in services}
+            Service.doctors.through.objects.bulk_create(
+                [
+                    Service.doctors.through(service_id=service_id, doctorprofile_id=doctor.id)
+                    for service_id, assigned in service_doctors.items()
+                    for doctor in assigned
+                ],
+                batch_size=batch_size,
+            )
+            # bulk_create не шлёт сигналов — историю цен начинаем сами
+            ServicePrice.objects.bulk_create(
+                [
+                    ServicePrice(
+                        service=service, price=service.price,
+                        valid_from=make_aware(datetime.combine(start_day, time.min)),
+                    )
+                    for service in services
+                ],
+                batch_size=batch_size,
+            )
+
+            appointments = Appointment.objects.bulk_create(
+                [
+                    Appointment(patient=rng.choice(patients), appointment_date=random_moment())
+                    for _ in range(options["appointments"] if patients else 0)
+                ],
+                batch_size=batch_size,
+            )
+
+            items = []
+            invoices = []
+            for appt in appointments:
+                total = Decimal(0)
+                busy_until = appt.appointment_date
+                for service in rng.sample(services, k=min(len(services), rng.randint(1, options["max_items"]))):
+                    candidates = service_doctors[service.id]
+                    doctor = rng.choice(candidates) if candidates else None
+                    ends_at = busy_until + timedelta(minutes=service.duration_minutes)
+                    items.append(AppointmentService(
+                        appointment=appt, service=service, doctor=doctor, price=service.price,
+                        starts_at=busy_until, ends_at=ends_at,
+                    ))
+                    busy_until = ends_at
+                    total += service.price
+
+                paid = rng.random() < options["paid_ratio"]
+                invoices.append(Invoice(
+                    appointment=appt,
+                    total_amount=total,
+                    status=Invoice.STATUS_PAID if paid else Invoice.STATUS_UNPAID,
+                    paid_at=appt.appointment_date + timedelta(hours=1) if paid else None,
+                    confirmed_by=cashier if paid else None,
+                ))
+
+            AppointmentService.objects.bulk_create(items, batch_size=batch_size)
+            Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+
+            # auto_now_add проставил «сейчас» — переносим дату счёта на дату приёма
+            for invoice in invoices:
+                invoice.created_at = invoice.appointment.appointment_date
+            Invoice.objects.bulk_update(invoices, ["created_at"], batch_size=batch_size)
+
+            # bulk-вставки не обновляют сводку выручки — пересобираем целиком
+            DailyRevenue.rebuild()
+
+        invalidate_catalog()
+        bump_data_version(SERVICE, INVOICE, APPOINTMENT_SERVICE)
+        rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: врачей {len(doctors)}, пациентов {len(patients)}, услуг {len(services)}, "
+            f"приёмов {len(appointments)}, услуг в приёмах {len(items)}, счетов {len(invoices)}. "
+            f"Пароль всех пользователей: {SEED_PASSWORD}"
+        ))
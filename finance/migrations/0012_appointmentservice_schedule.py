@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_invoice_status_created_idx'),
+        ('service', '0004_service_duration_minutes'),
+        ('users', '0008_doctorworkinghours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointmentservice',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointmentservice',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentservice',
+            index=models.Index(fields=['doctor', 'starts_at'], name='apptservice_doctor_start_idx'),
+        ),
+    ]
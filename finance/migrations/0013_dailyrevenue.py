@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0012_appointmentservice_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('doctor_id', models.PositiveIntegerField(default=0)),
+                ('service_id', models.PositiveIntegerField()),
+                ('items_count', models.PositiveIntegerField(default=0)),
+                ('billed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_count', models.PositiveIntegerField(default=0)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Выручка за день',
+                'verbose_name_plural': 'Выручка по дням',
+                'constraints': [models.UniqueConstraint(fields=('day', 'doctor_id', 'service_id'), name='dailyrevenue_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('html', 'HTML для печати'), ('txt', 'Текст для чекового принтера')], max_length=4)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='finance.invoice')),
+            ],
+            options={
+                'verbose_name': 'Чек',
+                'verbose_name_plural': 'Чеки',
+                'constraints': [models.UniqueConstraint(fields=('invoice', 'format'), name='receipt_invoice_format')],
+            },
+        ),
+    ]
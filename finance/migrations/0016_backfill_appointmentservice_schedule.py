@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_schedule(apps, schema_editor):
+    # записи до 0012 без времени: считаем, что услуга начинается в момент приёма,
+    # иначе проверка занятости врача их не видит и слот можно занять повторно
+    AppointmentService = apps.get_model('finance', 'AppointmentService')
+    items = (
+        AppointmentService.objects
+        .filter(starts_at__isnull=True)
+        .select_related('appointment', 'service')
+        .order_by('id')
+    )
+    batch = []
+    for item in items.iterator(chunk_size=BATCH_SIZE):
+        item.starts_at = item.appointment.appointment_date
+        item.ends_at = item.starts_at + timedelta(minutes=item.service.duration_minutes)
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            AppointmentService.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+            batch = []
+    if batch:
+        AppointmentService.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0015_appointmentservice_updated_at'),
+        ('service', '0004_service_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,49 @@
-from django.db import models
-from django.utils.timezone import now
+from django.db import models, connection, transaction
+from django.utils.timezone import now, make_aware, localdate
+from datetime import datetime, time, timedelta
 from users.models import PatientProfile, DoctorProfile
 from service.models import Service
-from django.db.models import Sum
+from django.db.models import Count, Sum, OuterRef, Subquery, Value, Q, Prefetch
+from django.db.models.functions import Coalesce, TruncDate
+from med_clinic.data_versions import bump_data_version, INVOICE
+from med_clinic import audit
+from med_clinic.jobs import enqueue
+
+# задача finance.tasks.render_invoice_receipts (по имени — tasks импортирует модели)
+RENDER_RECEIPTS = "finance.render_receipts"
+# задача finance.tasks.rebuild_revenue_day
+REBUILD_REVENUE_DAY = "finance.rebuild_revenue_day"
+
+
+class AppointmentQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Сумма услуг приёма в том же SQL-запросе (services_total)"""
+        return self.annotate(
+            services_total=Coalesce(Sum("services__price"), Value(0), output_field=models.DecimalField())
+        )
+
+    def with_service_count(self):
+        """Количество услуг приёма в том же SQL-запросе (services_count)"""
+        return self.annotate(services_count=Count("services"))
+
+    def with_details(self):
+        """
+        Счёт приёма через JOIN, услуги с врачами и названиями — одним запросом
+        на всю выборку (на страницу), сколько бы приёмов в ней ни было.
+        """
+        return self.select_related("invoice_link").prefetch_related(Prefetch(
+            "services",
+            queryset=AppointmentService.objects.select_related("service", "doctor__user").order_by("starts_at", "id"),
+        ))
+
+    def scheduled_between(self, date_from=None, date_to=None):
+        """Приёмы в диапазоне дат (включительно), по границам суток"""
+        qs = self
+        if date_from:
+            qs = qs.filter(appointment_date__gte=make_aware(datetime.combine(date_from, time.min)))
+        if date_to:
+            qs = qs.filter(appointment_date__lt=make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+        return qs
 
 
 class Appointment(models.Model):
@@ -13,15 +54,49 @@ class Appointment(models.Model):
     )
     appointment_date = models.DateTimeField(default=now)
 
+    objects = AppointmentQuerySet.as_manager()
 
     def __str__(self):
         return f"Приём {self.id} — {self.patient}"
 
     @property
     def total_cost(self):
-        """Сумма всех услуг приёма"""
+        """Сумма всех услуг приёма (берётся из with_totals(), если есть)"""
+        if "services_total" in self.__dict__:
+            return self.services_total
         return self.services.aggregate(total=Sum("price"))["total"] or 0
 
+    @property
+    def service_count(self):
+        """Количество услуг приёма (берётся из with_service_count(), если есть)"""
+        if "services_count" in self.__dict__:
+            return self.services_count
+        return self.services.count()
+
+
+class AppointmentServiceQuerySet(models.QuerySet):
+    def worklist(self, doctor_user, day):
+        """
+        Услуги врача на день по времени начала — список пациентов врача.
+        Один запрос по индексу (doctor, starts_at); приём, пациент и услуга — в том же JOIN.
+        У записей без starts_at (сделанных до появления расписания) время — дата приёма;
+        scheduled_at — время услуги с учётом этого.
+        """
+        start = make_aware(datetime.combine(day, time.min))
+        end = start + timedelta(days=1)
+        return (
+            self
+            .filter(doctor__user=doctor_user)
+            .filter(
+                Q(starts_at__gte=start, starts_at__lt=end)
+                | Q(starts_at__isnull=True, appointment__appointment_date__gte=start,
+                    appointment__appointment_date__lt=end)
+            )
+            .annotate(scheduled_at=Coalesce("starts_at", "appointment__appointment_date"))
+            .select_related("appointment__patient__user", "service")
+            .order_by("scheduled_at", "id")
+        )
+
 
 class AppointmentService(models.Model):
     appointment = models.ForeignKey(
@@ -42,12 +117,94 @@ class AppointmentService(models.Model):
         related_name="appointment_services"
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # время, на которое занят врач (заполняется при записи)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    # для опроса изменений списка врача (см. users.views.doctor_worklist_changes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AppointmentServiceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # расписание врача на день
+            models.Index(fields=["doctor", "starts_at"], name="apptservice_doctor_start_idx"),
+        ]
 
     def __str__(self):
         return f"{self.service.name} ({self.doctor or 'без врача'})"
 
 
+class InvoiceQuerySet(models.QuerySet):
+    def created_between(self, date_from=None, date_to=None):
+        """
+        Счета, выставленные в диапазоне дат (включительно).
+        Фильтр по границам суток, а не по created_at__date, чтобы работал индекс.
+        """
+        qs = self
+        if date_from:
+            qs = qs.filter(created_at__gte=make_aware(datetime.combine(date_from, time.min)))
+        if date_to:
+            qs = qs.filter(created_at__lt=make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+        return qs
+
+    def paid_on(self, day):
+        """Счета, оплаченные в этот день (по границам суток)"""
+        start = make_aware(datetime.combine(day, time.min))
+        return self.filter(paid_at__gte=start, paid_at__lt=start + timedelta(days=1))
+
+    def mark_paid(self, cashier):
+        """
+        Оплатить неоплаченные счета выборки одним условным UPDATE
+        (... WHERE status = 'ожидает оплаты'), меняя только статус, время и кассира.
+        Номера счетов выбираются в той же транзакции до UPDATE под блокировкой записи
+        (transaction_mode=IMMEDIATE в SQLite, SELECT ... FOR UPDATE в других СУБД),
+        поэтому параллельный кассир не оплатит их между выборкой и UPDATE и двойной
+        оплаты не бывает. Чеки оплаченных счетов рисует задача в очереди, оплата
+        попадает в журнал аудита. Возвращает число оплаченных счетов.
+        """
+        paid_at = now()
+        with transaction.atomic():
+            paid_ids = list(
+                self.filter(status=Invoice.STATUS_UNPAID).select_for_update().values_list("id", flat=True)
+            )
+            if not paid_ids:
+                return 0
+            paid = Invoice.objects.filter(id__in=paid_ids, status=Invoice.STATUS_UNPAID).update(
+                status=Invoice.STATUS_PAID,
+                paid_at=paid_at,
+                confirmed_by=cashier,
+            )
+            DailyRevenue.record_paid(Invoice.objects.filter(id__in=paid_ids))
+            enqueue(RENDER_RECEIPTS, {"invoice_ids": paid_ids})
+            # UPDATE не шлёт сигналов — журнал аудита и фрагменты обновляем сами
+            audit.record(
+                Invoice, paid_ids, audit.AuditEntry.ACTION_UPDATE,
+                {"status": [Invoice.STATUS_UNPAID, Invoice.STATUS_PAID], "confirmed_by_id": [None, cashier.pk]},
+                actor=cashier,
+            )
+            bump_data_version(INVOICE)
+        return paid
+
+    def for_patient(self, query):
+        """Счета пациента по имени, фамилии, логину или телефону"""
+        return self.filter(
+            Q(appointment__patient__user__first_name__icontains=query)
+            | Q(appointment__patient__user__last_name__icontains=query)
+            | Q(appointment__patient__user__username__icontains=query)
+            | Q(appointment__patient__user__phone__icontains=query)
+        )
+
+
 class Invoice(models.Model):
+    STATUS_UNPAID = "ожидает оплаты"
+    STATUS_PAID = "оплачено"
+
+    STATUS_CHOICES = [
+        (STATUS_UNPAID, "Ожидает оплаты"),
+        (STATUS_PAID, "Оплачено"),
+    ]
+
     appointment = models.OneToOneField(
         Appointment,
         on_delete=models.CASCADE,
@@ -58,11 +215,8 @@ class Invoice(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(
         max_length=20,
-        choices=[
-            ("ожидает оплаты", "Ожидает оплаты"),
-            ("оплачено", "Оплачено"),
-        ],
-        default="ожидает оплаты"
+        choices=STATUS_CHOICES,
+        default=STATUS_UNPAID
     )
     created_at = models.DateTimeField(auto_now_add=True)
     paid_at = models.DateTimeField(null=True, blank=True)
@@ -75,6 +229,8 @@ class Invoice(models.Model):
         verbose_name="Кассир"
     )
 
+    objects = InvoiceQuerySet.as_manager()
+
     def __str__(self):
         return f"Счёт #{self.pk} (Приём {self.appointment.id}) на {self.total_amount} сум"
 
@@ -82,8 +238,187 @@ class Invoice(models.Model):
         verbose_name = "Счёт"
         verbose_name_plural = "Счета"
         ordering = ['-created_at']
+        indexes = [
+            # панель кассира и список счетов: фильтр по статусу и дате выставления
+            models.Index(fields=["status", "created_at"], name="invoice_status_created_idx"),
+        ]
+
+    @classmethod
+    def sync_total(cls, appointment_id):
+        """Пересчитать сумму счёта приёма одним UPDATE по его услугам и записать изменение в журнал аудита"""
+        services_total = (
+            AppointmentService.objects
+            .filter(appointment_id=OuterRef("appointment_id"))
+            .values("appointment_id")
+            .annotate(total=Sum("price"))
+            .values("total")
+        )
+        invoices = cls.objects.filter(appointment_id=appointment_id)
+        with transaction.atomic():
+            previous = dict(invoices.select_for_update().values_list("id", "total_amount"))
+            if not previous:
+                return
+            invoices.update(
+                total_amount=Coalesce(Subquery(services_total), Value(0), output_field=models.DecimalField())
+            )
+            # UPDATE не шлёт сигналов — старую и новую сумму пишем в журнал сами
+            for invoice_id, total in invoices.values_list("id", "total_amount"):
+                if total != previous.get(invoice_id, total):
+                    audit.record(
+                        Invoice, invoice_id, audit.AuditEntry.ACTION_UPDATE,
+                        {"total_amount": [previous[invoice_id], total]},
+                    )
 
     def recalc_total(self):
         """Пересчитать сумму по услугам приёма"""
-        self.total_amount = self.appointment.total_cost
-        self.save()
+        Invoice.sync_total(self.appointment_id)
+        self.refresh_from_db(fields=["total_amount"])
+
+
+class Receipt(models.Model):
+    """
+    Чек оплаченного счёта в одном из форматов. Сам файл лежит в RECEIPTS_ROOT
+    под именем digest — sha256 содержимого (см. finance.receipts).
+    """
+    FORMAT_HTML = "html"
+    FORMAT_TEXT = "txt"
+
+    FORMAT_CHOICES = [
+        (FORMAT_HTML, "HTML для печати"),
+        (FORMAT_TEXT, "Текст для чекового принтера"),
+    ]
+
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="receipts")
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveIntegerField()
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Чек"
+        verbose_name_plural = "Чеки"
+        constraints = [
+            models.UniqueConstraint(fields=["invoice", "format"], name="receipt_invoice_format"),
+        ]
+
+    def __str__(self):
+        return f"Чек счёта #{self.invoice_id} ({self.format})"
+
+
+class DailyRevenue(models.Model):
+    """
+    Сводка выручки: день приёма × врач × услуга.
+    Обновляется инкрементально при выставлении и оплате счёта, поэтому отчёты
+    читают только её и не сканируют счета. Прочие изменения (правка и удаление
+    услуг приёма, счёта или приёма, перенос приёма) ставят в очередь пересборку
+    сводки за затронутый день (finance.signals). Пересобрать с нуля можно
+    командой rebuild_revenue_rollup.
+
+    Врач и услуга хранятся числами без внешних ключей: это сводка, её строки
+    не должны исчезать вместе со справочниками, а 0 в doctor_id означает
+    «без врача» (с NULL уникальный ключ не работал бы).
+    """
+    NO_DOCTOR = 0
+
+    day = models.DateField()
+    doctor_id = models.PositiveIntegerField(default=NO_DOCTOR)
+    service_id = models.PositiveIntegerField()
+    items_count = models.PositiveIntegerField(default=0)
+    billed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Выручка за день"
+        verbose_name_plural = "Выручка по дням"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "doctor_id", "service_id"], name="dailyrevenue_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: врач {self.doctor_id or '—'}, услуга {self.service_id} — {self.billed_amount} сум"
+
+    @classmethod
+    def _upsert(cls, rows):
+        """
+        Прибавить к сводке строки (day, doctor_id, service_id, items, billed, paid_count, paid)
+        одним INSERT ... ON CONFLICT DO UPDATE.
+        """
+        if not rows:
+            return
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} "
+                f"(day, doctor_id, service_id, items_count, billed_amount, paid_count, paid_amount) "
+                f"VALUES (%s, %s, %s, %s, %s, %s, %s) "
+                f"ON CONFLICT (day, doctor_id, service_id) DO UPDATE SET "
+                f"items_count = {table}.items_count + excluded.items_count, "
+                f"billed_amount = {table}.billed_amount + excluded.billed_amount, "
+                f"paid_count = {table}.paid_count + excluded.paid_count, "
+                f"paid_amount = {table}.paid_amount + excluded.paid_amount",
+                [
+                    (day, doctor_id, service_id, items, str(billed), paid_count, str(paid))
+                    for day, doctor_id, service_id, items, billed, paid_count, paid in rows
+                ],
+            )
+
+    @classmethod
+    def record_billed(cls, items):
+        """Учесть услуги только что выставленного счёта (объекты AppointmentService)"""
+        totals = {}
+        for item in items:
+            key = (localdate(item.appointment.appointment_date), item.doctor_id or cls.NO_DOCTOR, item.service_id)
+            count, amount = totals.get(key, (0, 0))
+            totals[key] = (count + 1, amount + item.price)
+        cls._upsert([key + (count, amount, 0, 0) for key, (count, amount) in totals.items()])
+
+    @classmethod
+    def _grouped_items(cls, items):
+        return (
+            items
+            .order_by()
+            .values("service_id")
+            .annotate(
+                day=TruncDate("appointment__appointment_date"),
+                doctor=Coalesce("doctor_id", Value(cls.NO_DOCTOR)),
+            )
+            .values("day", "doctor", "service_id")
+            .annotate(count=Count("id"), amount=Sum("price"))
+        )
+
+    @classmethod
+    def record_paid(cls, invoices):
+        """Учесть оплату счетов (queryset Invoice)"""
+        rows = cls._grouped_items(AppointmentService.objects.filter(appointment__invoice_link__in=invoices))
+        cls._upsert([
+            (row["day"], row["doctor"], row["service_id"], 0, 0, row["count"], row["amount"])
+            for row in rows
+        ])
+
+    @classmethod
+    def rebuild(cls, days=None):
+        """Пересобрать сводку по всем счетам или только за дни days. Возвращает число строк сводки."""
+        items = AppointmentService.objects.filter(appointment__invoice_link__isnull=False)
+        rollup = cls.objects.all()
+        if days is not None:
+            items = items.filter(appointment__appointment_date__date__in=days)
+            rollup = rollup.filter(day__in=days)
+        paid = Q(appointment__invoice_link__status=Invoice.STATUS_PAID)
+        rows = cls._grouped_items(items).annotate(
+            paid_count=Count("id", filter=paid),
+            paid_amount=Coalesce(Sum("price", filter=paid), Value(0), output_field=models.DecimalField()),
+        )
+        with transaction.atomic():
+            rollup.delete()
+            cls._upsert([
+                (row["day"], row["doctor"], row["service_id"], row["count"], row["amount"],
+                 row["paid_count"], row["paid_amount"])
+                for row in rows
+            ])
+        return rollup.count()
+
+    @classmethod
+    def refresh_day(cls, appointment_date):
+        """Поставить в очередь пересборку сводки за день приёма (одна задача на день)"""
+        enqueue(REBUILD_REVENUE_DAY, {"day": localdate(appointment_date).isoformat()}, unique=True)
@@ -0,0 +1,120 @@
+"""
+Чеки оплаченных счетов: HTML для печати из браузера и текст для чекового принтера.
+
+Чек отрисовывается один раз — задачей в очереди сразу после оплаты — и
+сохраняется в RECEIPTS_ROOT под именем, равным sha256 содержимого. Файл с
+таким именем никогда не меняется, поэтому отдаётся с Cache-Control: immutable;
+если счёт перерисуют, у чека будет новое имя и новая ссылка.
+
+Пакетный режим (команда render_receipts) собирает данные чеков в основном
+процессе одним проходом по базе, а отрисовку и запись файлов раздаёт пулу
+процессов.
+"""
+import hashlib
+import os
+import tempfile
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from django.utils.timezone import localtime
+
+from med_clinic.processes import process_pool, chunk_size
+from users.models import display_name
+from .models import AppointmentService, Invoice, Receipt
+
+TEMPLATES = {
+    Receipt.FORMAT_HTML: "finance/receipt.html",
+    Receipt.FORMAT_TEXT: "finance/receipt.txt",
+}
+CONTENT_TYPES = {
+    Receipt.FORMAT_HTML: "text/html; charset=utf-8",
+    Receipt.FORMAT_TEXT: "text/plain; charset=utf-8",
+}
+
+
+def receipt_path(digest, fmt, root=None):
+    return Path(root or settings.RECEIPTS_ROOT) / digest[:2] / f"{digest}.{fmt}"
+
+
+def receipt_context(invoice):
+    """Данные чека простыми значениями — их можно передать в другой процесс"""
+    appt = invoice.appointment
+    return {
+        "invoice_id": invoice.id,
+        "paid_at": localtime(invoice.paid_at).strftime("%d.%m.%Y %H:%M"),
+        "cashier": display_name(invoice.confirmed_by),
+        "patient": display_name(appt.patient.user),
+        "appointment_date": localtime(appt.appointment_date).strftime("%d.%m.%Y %H:%M"),
+        "items": [
+            {
+                "service": item.service.name,
+                "doctor": display_name(item.doctor.user if item.doctor else None),
+                "price": item.price,
+            }
+            for item in appt.services.all()
+        ],
+        "total": invoice.total_amount,
+    }
+
+
+def store(content, fmt, root=None):
+    """Записать содержимое под именем его sha256, если такого файла ещё нет. Возвращает (digest, размер)."""
+    data = content.encode()
+    digest = hashlib.sha256(data).hexdigest()
+    path = receipt_path(digest, fmt, root)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # через временный файл: читатель никогда не увидит недописанный чек
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return digest, len(data)
+
+
+def _render(context, root):
+    """Отрисовать и сохранить чек во всех форматах: {формат: (digest, размер)}"""
+    return {fmt: store(render_to_string(template, context), fmt, root) for fmt, template in TEMPLATES.items()}
+
+
+def render_receipts(invoices, workers=1, force=False):
+    """
+    Отрисовать чеки оплаченных счетов выборки, у которых чеков ещё нет
+    (force=True — перерисовать все). Возвращает число счетов с новыми чеками.
+    """
+    invoices = (
+        invoices
+        .filter(status=Invoice.STATUS_PAID, appointment__isnull=False)
+        .select_related("appointment__patient__user", "confirmed_by")
+        .prefetch_related(Prefetch(
+            "appointment__services",
+            queryset=AppointmentService.objects.select_related("service", "doctor__user").order_by("id"),
+        ))
+        .order_by("id")
+    )
+    if not force:
+        invoices = invoices.filter(receipts__isnull=True)
+    contexts = [receipt_context(invoice) for invoice in invoices]
+
+    # каталог передаём явно: настройки, переопределённые в этом процессе, в пул не попадают
+    render = partial(_render, root=str(settings.RECEIPTS_ROOT))
+    if workers > 1 and len(contexts) > 1:
+        with process_pool(workers) as pool:
+            rendered = list(pool.map(render, contexts, chunksize=chunk_size(len(contexts), workers)))
+    else:
+        rendered = [render(context) for context in contexts]
+
+    Receipt.objects.bulk_create(
+        [
+            Receipt(invoice_id=context["invoice_id"], format=fmt, digest=digest, size=size)
+            for context, files in zip(contexts, rendered)
+            for fmt, (digest, size) in files.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["invoice", "format"],
+        update_fields=["digest", "size", "rendered_at"],
+    )
+    return len(contexts)
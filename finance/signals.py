@@ -0,0 +1,74 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from med_clinic import audit
+from med_clinic.data_versions import bump_data_version, INVOICE, APPOINTMENT_SERVICE
+from .models import Appointment, AppointmentService, DailyRevenue, Invoice
+
+# журнал аудита: создание, изменение перечисленных полей и удаление
+audit.track(Invoice, ["status", "total_amount", "confirmed_by"])
+audit.track(Appointment, ["appointment_date", "patient"])
+audit.track(AppointmentService, ["service", "doctor", "price", "starts_at"])
+
+
+@receiver(post_save, sender=AppointmentService)
+@receiver(post_delete, sender=AppointmentService)
+def sync_invoice_total(sender, instance, **kwargs):
+    """
+    Держим Invoice.total_amount в актуальном состоянии при изменении услуг приёма.
+    Обновление идёт в той же транзакции, что и запись услуги.
+    """
+    Invoice.sync_total(instance.appointment_id)
+    bump_data_version(APPOINTMENT_SERVICE, INVOICE)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_changed(sender, **kwargs):
+    """Сбрасываем кэшированные фрагменты списков счетов."""
+    bump_data_version(INVOICE)
+
+
+def _refresh_revenue(appointment_id):
+    appointment_date = (
+        Appointment.objects.filter(pk=appointment_id).values_list("appointment_date", flat=True).first()
+    )
+    if appointment_date is not None:
+        DailyRevenue.refresh_day(appointment_date)
+
+
+@receiver(post_save, sender=AppointmentService)
+@receiver(post_delete, sender=AppointmentService)
+def item_revenue_changed(sender, instance, raw=False, **kwargs):
+    """
+    Услугу приёма добавили, изменили или удалили (в том числе вместе со счётом
+    или приёмом) — сводка выручки за день приёма пересоберётся задачей.
+    Запись на приём идёт через bulk_create и учитывается в сводке сразу.
+    """
+    if not raw:
+        _refresh_revenue(instance.appointment_id)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_revenue_changed(sender, instance, created=False, raw=False, **kwargs):
+    """Счёт изменён через save() или удалён; новый счёт учитывает record_billed."""
+    if not created and not raw and instance.appointment_id:
+        _refresh_revenue(instance.appointment_id)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_date(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._saved_appointment_date = (
+            Appointment.objects.filter(pk=instance.pk).values_list("appointment_date", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_moved(sender, instance, raw=False, **kwargs):
+    """Приём перенесли на другое время — пересобираем сводку за старый и новый день."""
+    previous = getattr(instance, "_saved_appointment_date", None)
+    if not raw and previous is not None and previous != instance.appointment_date:
+        DailyRevenue.refresh_day(previous)
+        DailyRevenue.refresh_day(instance.appointment_date)
@@ -0,0 +1,23 @@
+from datetime import date
+
+from med_clinic.jobs import task
+from .models import DailyRevenue, Invoice, RENDER_RECEIPTS, REBUILD_REVENUE_DAY
+from .receipts import render_receipts
+
+
+@task("finance.rebuild_revenue_rollup", max_attempts=3)
+def rebuild_revenue_rollup():
+    """Пересобрать сводку выручки (см. DailyRevenue.rebuild)"""
+    DailyRevenue.rebuild()
+
+
+@task(REBUILD_REVENUE_DAY, max_attempts=3)
+def rebuild_revenue_day(day):
+    """Пересобрать сводку выручки за один день (день — в ISO-формате)"""
+    DailyRevenue.rebuild(days=[date.fromisoformat(day)])
+
+
+@task(RENDER_RECEIPTS)
+def render_invoice_receipts(invoice_ids):
+    """Отрисовать чеки только что оплаченных счетов (см. finance.receipts)"""
+    render_receipts(Invoice.objects.filter(id__in=invoice_ids))
@@ -1,3 +1,772 @@
-from django.test import TestCase
+import csv
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import hashlib
+import importlib
+import json
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from users.models import User, DoctorProfile, PatientProfile, DoctorWorkingHours
+from service.catalog import get_catalog, invalidate_catalog
+from service.models import Service, ServicePrice
+from .availability import DoctorSchedule, load_schedules
+from med_clinic import audit
+from med_clinic.models import Job
+from med_clinic.test_runner import in_another_process
+from .models import (
+    Appointment, AppointmentService, Invoice, DailyRevenue, Receipt, RENDER_RECEIPTS,
+    REBUILD_REVENUE_DAY,
+)
+from .receipts import receipt_path, render_receipts
+
+
+class AppointmentCreateTests(TestCase):
+    """Создание приёма с несколькими услугами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        cls.patient = PatientProfile.objects.create(user=patient_user)
+        doctor_user = User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        cls.doctor = DoctorProfile.objects.create(user=doctor_user)
+        cls.services = []
+        for i in range(10):
+            service = Service.objects.create(name=f"Услуга {i}", price=Decimal("100.00") + i)
+            service.doctors.add(cls.doctor)
+            cls.services.append(service)
+
+    def setUp(self):
+        invalidate_catalog()
+        self.client.force_login(self.manager)
+        self.url = reverse("appointment_create", args=[self.patient.user_id])
+
+    def _post(self, services):
+        data = {
+            "services": [str(s.id) for s in services],
+            "date": "2025-09-01T10:00",
+        }
+        for service in services:
+            data[f"doctor_for_{service.id}"] = str(self.doctor.id)
+        return self.client.post(self.url, data)
+
+    def test_creates_items_and_invoice(self):
+        response = self._post(self.services[:3])
+
+        self.assertRedirects(response, reverse("manager_dashboard"), fetch_redirect_response=False)
+        appt = Appointment.objects.get()
+        items = AppointmentService.objects.filter(appointment=appt)
+        self.assertEqual(items.count(), 3)
+        self.assertTrue(all(item.doctor_id == self.doctor.id for item in items))
+        self.assertEqual(Invoice.objects.get(appointment=appt).total_amount, Decimal("303.00"))
+
+    def test_ineligible_doctor_is_dropped(self):
+        other_user = User.objects.create_user(username="other", password="pass", role=User.ROLE_DOCTOR)
+        other = DoctorProfile.objects.create(user=other_user)
+        service = self.services[0]
+
+        self.client.post(self.url, {
+            "services": str(service.id),
+            "date": "2025-09-01T10:00",
+            f"doctor_for_{service.id}": str(other.id),
+        })
+
+        self.assertIsNone(AppointmentService.objects.get().doctor_id)
+
+    def test_unknown_service_creates_nothing(self):
+        self.client.post(self.url, {"services": "999999", "date": "2025-09-01T10:00"})
+
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_query_count_does_not_depend_on_basket_size(self):
+        get_catalog()
+        self.client.get(self.url)
+        # пациент + savepoint, рабочие часы, занятость врачей,
+        # приём, позиции, счёт, сводка выручки, release;
+        # сессия, пользователь, услуги и врачи берутся из кэша
+        with self.assertNumQueries(9):
+            self._post(self.services[:1])
+        AppointmentService.objects.update(doctor=None)
+        with self.assertNumQueries(9):
+            self._post(self.services)
+
+    def test_price_changed_in_another_worker_is_charged(self):
+        get_catalog()
+        # другой процесс записал новую цену в историю и сбросил общую версию каталога
+        ServicePrice.objects.filter(service=self.services[0]).update(price=Decimal("500.00"))
+        in_another_process(invalidate_catalog)
+
+        self._post(self.services[:1])
+
+        self.assertEqual(AppointmentService.objects.get().price, Decimal("500.00"))
+
+    def test_busy_doctor_is_rejected(self):
+        self._post(self.services[:1])
+        self.client.post(self.url, {
+            "services": str(self.services[1].id),
+            "date": "2025-09-01T10:15",
+            f"doctor_for_{self.services[1].id}": str(self.doctor.id),
+        })
+
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_services_of_one_doctor_are_consecutive(self):
+        self._post(self.services[:2])
+
+        first, second = AppointmentService.objects.order_by("starts_at")
+        self.assertEqual(first.ends_at, second.starts_at)
+
+
+class InvoiceTotalTests(TestCase):
+    """Сумма счёта поддерживается при изменении услуг приёма."""
+
+    @classmethod
+    def setUpTestData(cls):
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        cls.patient = PatientProfile.objects.create(user=patient_user)
+        cls.service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+
+    def test_total_follows_line_items(self):
+        appt = Appointment.objects.create(patient=self.patient)
+        invoice = Invoice.objects.create(appointment=appt)
+
+        item = AppointmentService.objects.create(appointment=appt, service=self.service, price=Decimal("50.00"))
+        AppointmentService.objects.create(appointment=appt, service=self.service, price=Decimal("25.00"))
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal("75.00"))
+
+        item.price = Decimal("10.00")
+        item.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal("35.00"))
+
+        AppointmentService.objects.filter(appointment=appt).delete()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal("0"))
+
+
+class InvoiceListTests(TestCase):
+    """Список счетов: только чтение, фильтры и пагинация."""
+
+    @classmethod
+    def setUpTestData(cls):
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        patient = PatientProfile.objects.create(user=patient_user)
+        service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+        for i in range(25):
+            appt = Appointment.objects.create(patient=patient)
+            AppointmentService.objects.create(appointment=appt, service=service, price=service.price)
+            Invoice.objects.create(
+                appointment=appt,
+                status=Invoice.STATUS_PAID if i % 5 == 0 else Invoice.STATUS_UNPAID,
+            )
+
+    def setUp(self):
+        # откат транзакции теста не сбрасывает кэш фрагментов
+        cache.clear()
+
+    def test_get_does_not_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("invoice_list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")])
+
+    def test_paginated(self):
+        response = self.client.get(reverse("invoice_list"), {"page": 2})
+
+        self.assertEqual(len(response.context["invoices"]), 5)
+
+    def test_filter_by_status(self):
+        response = self.client.get(reverse("invoice_list"), {"status": Invoice.STATUS_PAID})
+
+        invoices = response.context["invoices"]
+        self.assertEqual(len(invoices), 5)
+        self.assertTrue(all(invoice.status == Invoice.STATUS_PAID for invoice in invoices))
+
+
+class AppointmentTotalsTests(TestCase):
+    """Суммы и количество услуг считаются в одном запросе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        patient = PatientProfile.objects.create(user=patient_user)
+        service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+        for count in range(4):
+            appt = Appointment.objects.create(patient=patient)
+            for _ in range(count):
+                AppointmentService.objects.create(appointment=appt, service=service, price=service.price)
+
+    def test_annotated_totals_in_single_query(self):
+        with self.assertNumQueries(1):
+            appointments = list(Appointment.objects.with_totals().with_service_count().order_by("id"))
+            totals = [(a.service_count, a.total_cost) for a in appointments]
+
+        self.assertEqual(totals, [(i, Decimal("50.00") * i) for i in range(4)])
+
+    def test_property_falls_back_to_query(self):
+        appt = Appointment.objects.order_by("-id").first()
+
+        self.assertEqual(appt.total_cost, Decimal("150.00"))
+        self.assertEqual(appt.service_count, 3)
+
+
+def _at(day, hour, minute=0):
+    return make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class DoctorScheduleTests(TestCase):
+    """Проверка пересечений и свободные слоты без БД."""
+
+    day = date(2025, 9, 1)
+
+    def test_conflicts(self):
+        schedule = DoctorSchedule(1, self.day, [
+            (_at(self.day, 9), _at(self.day, 12)),   # длинный интервал из старых данных
+            (_at(self.day, 10), _at(self.day, 10, 30)),
+            (_at(self.day, 14), _at(self.day, 15)),
+        ], [])
+
+        self.assertTrue(schedule.conflicts(_at(self.day, 11), _at(self.day, 11, 30)))
+        self.assertTrue(schedule.conflicts(_at(self.day, 13, 30), _at(self.day, 14, 30)))
+        self.assertFalse(schedule.conflicts(_at(self.day, 12), _at(self.day, 14)))
+        self.assertFalse(schedule.conflicts(_at(self.day, 15), _at(self.day, 16)))
+
+    def test_free_slots_inside_working_hours(self):
+        schedule = DoctorSchedule(
+            1, self.day,
+            [(_at(self.day, 9, 30), _at(self.day, 10))],
+            [(_at(self.day, 9), _at(self.day, 11))],
+        )
+
+        self.assertEqual(
+            schedule.free_slots(timedelta(minutes=30)),
+            [_at(self.day, 9), _at(self.day, 10), _at(self.day, 10, 30)],
+        )
+        self.assertFalse(schedule.within_working_hours(_at(self.day, 10, 30), _at(self.day, 11, 30)))
+
+
+class DoctorAvailabilityTests(TestCase):
+    """Расписание из БД и JSON для формы записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        doctor_user = User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        cls.doctor = DoctorProfile.objects.create(user=doctor_user)
+        cls.day = date(2025, 9, 1)
+        DoctorWorkingHours.objects.create(
+            doctor=cls.doctor, weekday=cls.day.weekday(), start_time=time(9), end_time=time(11)
+        )
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        appt = Appointment.objects.create(patient=PatientProfile.objects.create(user=patient_user))
+        service = Service.objects.create(name="Приём", price=Decimal("10.00"))
+        AppointmentService.objects.create(
+            appointment=appt, service=service, doctor=cls.doctor, price=service.price,
+            starts_at=_at(cls.day, 9), ends_at=_at(cls.day, 10),
+        )
+
+    def test_load_schedules_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            schedule = load_schedules([self.doctor.id], self.day)[self.doctor.id]
+
+        self.assertTrue(schedule.conflicts(_at(self.day, 9, 30), _at(self.day, 10, 30)))
+        self.assertTrue(schedule.is_available(_at(self.day, 10), _at(self.day, 11)))
+
+    def test_day_without_hours_is_unavailable(self):
+        sunday = self.day - timedelta(days=1)
+        other = DoctorProfile.objects.create(
+            user=User.objects.create_user(username="other", password="pass", role=User.ROLE_DOCTOR)
+        )
+
+        schedules = load_schedules([self.doctor.id, other.id], sunday)
+
+        # часы заданы только на понедельник — в воскресенье врач не работает
+        self.assertFalse(schedules[self.doctor.id].is_available(_at(sunday, 3), _at(sunday, 3, 30)))
+        self.assertEqual(schedules[self.doctor.id].free_slots(timedelta(minutes=30)), [])
+        # у врача без рабочих часов ограничений нет
+        self.assertTrue(schedules[other.id].is_available(_at(sunday, 3), _at(sunday, 3, 30)))
+
+    def test_booking_on_a_day_off_is_rejected(self):
+        service = Service.objects.get()
+        service.doctors.add(self.doctor)
+        invalidate_catalog()
+        self.client.force_login(self.manager)
+        patient = PatientProfile.objects.get()
+
+        self.client.post(reverse("appointment_create", args=[patient.user_id]), {
+            "services": str(service.id),
+            "date": "2025-08-31T03:00",
+            f"doctor_for_{service.id}": str(self.doctor.id),
+        })
+
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_bookings_made_before_the_schedule_fields_still_count(self):
+        migration = importlib.import_module("finance.migrations.0016_backfill_appointmentservice_schedule")
+        service = Service.objects.create(name="Старая услуга", price=Decimal("10.00"), duration_minutes=45)
+        appt = Appointment.objects.create(patient=PatientProfile.objects.get(), appointment_date=_at(self.day, 10))
+        legacy = AppointmentService.objects.create(
+            appointment=appt, service=service, doctor=self.doctor, price=service.price
+        )
+
+        migration.backfill_schedule(apps, None)
+
+        legacy.refresh_from_db()
+        self.assertEqual((legacy.starts_at, legacy.ends_at), (_at(self.day, 10), _at(self.day, 10, 45)))
+        schedule = load_schedules([self.doctor.id], self.day)[self.doctor.id]
+        self.assertFalse(schedule.is_available(_at(self.day, 10, 30), _at(self.day, 11)))
+
+    def test_endpoint_returns_free_slots(self):
+        self.client.force_login(self.manager)
+        url = reverse("doctor_availability", args=[self.doctor.id])
+
+        response = self.client.get(url, {"date": self.day.isoformat(), "duration": 30})
+
+        self.assertEqual(response.json()["slots"], ["10:00", "10:30"])
+        self.assertEqual(self.client.get(url, {"date": "bad"}).status_code, 400)
+
+
+class SeedAndBenchmarkTests(TestCase):
+    """Генератор данных и прогон страниц."""
+
+    SIZE = {"patients": 15, "doctors": 3, "services": 5, "appointments": 40, "seed": 7}
+
+    def _seed(self, **extra):
+        call_command("seed_data", stdout=StringIO(), **self.SIZE, **extra)
+        return list(
+            AppointmentService.objects.order_by("id").values_list("service__name", "price", "appointment__patient__user__username")
+        )
+
+    def test_seed_is_deterministic(self):
+        first = self._seed()
+        second = self._seed(clear=True)
+
+        self.assertEqual(first, second)
+        self.assertEqual(Appointment.objects.count(), 40)
+        self.assertEqual(Invoice.objects.count(), 40)
+
+    def test_invoice_totals_match_line_items(self):
+        self._seed()
+
+        for appt in Appointment.objects.with_totals().select_related("invoice_link"):
+            self.assertEqual(appt.invoice_link.total_amount, appt.total_cost)
+
+    def test_benchmark_reports_every_view(self):
+        self._seed()
+        out = StringIO()
+
+        call_command("benchmark_views", repeat=2, warmup=0, stdout=out)
+
+        report = out.getvalue()
+        for view in ("manager_dashboard", "cashier_dashboard", "invoice_list", "service_list"):
+            self.assertIn(view, report)
+
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    """Бенчмарк смешанной нагрузки: копирует базу, поэтому данные должны быть закоммичены."""
+
+    def test_compares_profiles_on_a_copy(self):
+        call_command("seed_data", stdout=StringIO(), **SeedAndBenchmarkTests.SIZE)
+        # копии базы подключаются под временными алиасами из потоков
+        aliases = {"default", "bench_baseline", "bench_tuned"}
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.object(ConcurrencyBenchmarkTests, "databases", aliases):
+            path = f"{tmpdir}/result.json"
+            call_command("benchmark_concurrency", threads=2, seconds=0.3, json_path=path, stdout=StringIO())
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)
+
+        self.assertEqual([row["profile"] for row in results], ["baseline", "tuned"])
+        for row in results:
+            self.assertGreater(row["reads"] + row["writes"], 0)
+        self.assertEqual(Appointment.objects.count(), 40)
+        # записи копий в журнал аудита выброшены вместе с копиями
+        self.assertEqual(audit.discard("bench_baseline") + audit.discard("bench_tuned"), 0)
+
+
+class AsgiBenchmarkTests(TransactionTestCase):
+    """Сравнение WSGI и ASGI: клиенты работают из других потоков, данные должны быть закоммичены."""
+
+    def test_compares_wsgi_and_asgi(self):
+        call_command("seed_data", stdout=StringIO(), **SeedAndBenchmarkTests.SIZE)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/result.json"
+            call_command("benchmark_asgi", clients=2, seconds=0.2, json_path=path, stdout=StringIO())
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)
+
+        self.assertIn("patient_dashboard", [row["view"] for row in results])
+        for row in results:
+            for handler in ("wsgi", "asgi"):
+                self.assertGreater(row[handler]["rps"], 0, row["view"])
+                self.assertEqual(row[handler]["errors"], 0, row["view"])
+
+    def test_refuses_inside_transaction(self):
+        with transaction.atomic(), self.assertRaises(CommandError):
+            call_command("benchmark_asgi", stdout=StringIO())
+
+
+class InvoicePaymentTests(TestCase):
+    """Оплата счёта условным UPDATE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashiers = [
+            User.objects.create_user(username=f"cashier{i}", password="pass", role=User.ROLE_CASHIER)
+            for i in range(2)
+        ]
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        appt = Appointment.objects.create(patient=PatientProfile.objects.create(user=patient_user))
+        cls.invoice = Invoice.objects.create(appointment=appt, total_amount=Decimal("10.00"))
+
+    def test_second_cashier_cannot_pay_again(self):
+        first = Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.cashiers[0])
+        second = Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.cashiers[1])
+
+        self.assertEqual((first, second), (1, 0))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.confirmed_by, self.cashiers[0])
+
+    def test_only_the_updated_invoices_are_reported(self):
+        earlier = Invoice.objects.create(appointment=None, total_amount=Decimal("20.00"))
+        moment = make_aware(datetime(2025, 9, 1, 12))
+        # тот же кассир и то же время оплаты — отличить счета можно только по самому UPDATE
+        with mock.patch("finance.models.now", return_value=moment):
+            Invoice.objects.filter(pk=earlier.pk).mark_paid(self.cashiers[0])
+            Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.cashiers[0])
+
+        payloads = [job.payload for job in Job.objects.filter(name=RENDER_RECEIPTS).order_by("id")]
+        self.assertEqual(payloads, [{"invoice_ids": [earlier.pk]}, {"invoice_ids": [self.invoice.pk]}])
+
+    def test_single_update_of_changed_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.cashiers[0])
+
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "finance_invoice"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("total_amount", updates[0])
+
+    def test_view_requires_post(self):
+        self.client.force_login(self.cashiers[0])
+        url = reverse("confirm_invoice_payment", args=[self.invoice.pk])
+
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.post(url)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, Invoice.STATUS_PAID)
+
+
+class DailyRevenueTests(TestCase):
+    """Сводка выручки по дням, врачам и услугам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        cls.cashier = User.objects.create_user(username="cashier", password="pass", role=User.ROLE_CASHIER)
+        patient_user = User.objects.create_user(username="patient", password="pass", role=User.ROLE_PATIENT)
+        cls.patient = PatientProfile.objects.create(user=patient_user)
+        doctor_user = User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        cls.doctor = DoctorProfile.objects.create(user=doctor_user)
+        cls.services = [
+            Service.objects.create(name=f"Услуга {i}", price=Decimal("100.00") * (i + 1)) for i in range(2)
+        ]
+        for service in cls.services:
+            service.doctors.add(cls.doctor)
+
+    def setUp(self):
+        invalidate_catalog()
+        self.client.force_login(self.manager)
+
+    def _create(self):
+        data = {"services": [str(s.id) for s in self.services], "date": "2025-09-01T10:00"}
+        data[f"doctor_for_{self.services[0].id}"] = str(self.doctor.id)
+        self.client.post(reverse("appointment_create", args=[self.patient.user_id]), data)
+
+    def _snapshot(self):
+        return list(
+            DailyRevenue.objects.order_by("service_id")
+            .values_list("day", "doctor_id", "service_id", "items_count", "billed_amount", "paid_count", "paid_amount")
+        )
+
+    def test_billed_on_create_and_paid_on_payment(self):
+        self._create()
+        self.assertEqual(self._snapshot(), [
+            (date(2025, 9, 1), self.doctor.id, self.services[0].id, 1, Decimal("100.00"), 0, Decimal("0")),
+            (date(2025, 9, 1), DailyRevenue.NO_DOCTOR, self.services[1].id, 1, Decimal("200.00"), 0, Decimal("0")),
+        ])
+
+        Invoice.objects.all().mark_paid(self.cashier)
+        self.assertEqual([row[5:] for row in self._snapshot()], [(1, Decimal("100.00")), (1, Decimal("200.00"))])
+
+    def test_repeated_payment_is_not_counted_twice(self):
+        self._create()
+        Invoice.objects.all().mark_paid(self.cashier)
+        Invoice.objects.all().mark_paid(self.cashier)
+
+        self.assertEqual(sum(row[5] for row in self._snapshot()), 2)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self._create()
+        self._create()
+        Invoice.objects.filter(pk=Invoice.objects.first().pk).mark_paid(self.cashier)
+        incremental = self._snapshot()
+
+        out = StringIO()
+        call_command("rebuild_revenue_rollup", stdout=out)
+
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertIn("2", out.getvalue())
+
+    def _run_jobs(self):
+        call_command("run_jobs", once=True, workers=1, stdout=StringIO())
+
+    def test_item_edit_is_rebuilt_for_its_day(self):
+        self._create()
+        item = AppointmentService.objects.get(service=self.services[1])
+        item.price = Decimal("250.00")
+        item.save()
+
+        self.assertEqual(Job.objects.filter(name=REBUILD_REVENUE_DAY, status=Job.STATUS_QUEUED).count(), 1)
+        self._run_jobs()
+        self.assertEqual([row[3:5] for row in self._snapshot()], [(1, Decimal("100.00")), (1, Decimal("250.00"))])
+
+    def test_item_and_invoice_delete_are_rebuilt_for_their_day(self):
+        self._create()
+        AppointmentService.objects.get(service=self.services[1]).delete()
+        self._run_jobs()
+        self.assertEqual([row[2:5] for row in self._snapshot()], [(self.services[0].id, 1, Decimal("100.00"))])
+
+        Invoice.objects.get().delete()
+        self._run_jobs()
+        self.assertEqual(self._snapshot(), [])
+
+    def test_moved_appointment_is_rebuilt_for_both_days(self):
+        self._create()
+        appointment = Appointment.objects.get()
+        appointment.appointment_date += timedelta(days=1)
+        appointment.save()
+        self._run_jobs()
+
+        self.assertEqual({row[0] for row in self._snapshot()}, {date(2025, 9, 2)})
+
+    def test_report_groups_rollup(self):
+        self._create()
+        response = self.client.get(reverse("revenue_report"), {
+            "date_from": "2025-09-01", "date_to": "2025-09-01", "group_by": "service_id",
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["label"] for row in response.context["rows"]], ["Услуга 0", "Услуга 1"])
+        self.assertEqual(response.context["totals"]["billed"], Decimal("300.00"))
+
+
+class ExportTests(TestCase):
+    """Потоковая выгрузка счетов и приёмов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        doctor_user = User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        doctor = DoctorProfile.objects.create(user=doctor_user)
+        service = Service.objects.create(name="Консультация", price=Decimal("100.00"))
+        for i in range(3):
+            user = User.objects.create_user(username=f"patient{i}", password="pass", role=User.ROLE_PATIENT)
+            appt = Appointment.objects.create(
+                patient=PatientProfile.objects.create(user=user),
+                appointment_date=make_aware(datetime(2025, 9, 1 + i, 10)),
+            )
+            for _ in range(2):
+                AppointmentService.objects.create(appointment=appt, service=service, doctor=doctor, price=service.price)
+            Invoice.objects.create(
+                appointment=appt,
+                total_amount=Decimal("200.00"),
+                status=Invoice.STATUS_PAID if i == 0 else Invoice.STATUS_UNPAID,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def _lines(self, response):
+        return b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+
+    def test_invoices_csv_has_row_per_line_item(self):
+        response = self.client.get(reverse("export_invoices"))
+
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        lines = self._lines(response)
+        self.assertTrue(lines[0].startswith("Счёт,"))
+        self.assertEqual(len(lines), 1 + 6)
+
+    def test_filters_by_status_and_date(self):
+        response = self.client.get(reverse("export_appointments"), {
+            "status": Invoice.STATUS_UNPAID, "date_from": "2025-09-03",
+        })
+
+        lines = self._lines(response)
+        self.assertEqual(len(lines), 2)
+        self.assertIn("patient2", lines[1])
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(username="patient2").update(first_name="=HYPERLINK(\"http://x\")", phone="+79001234567")
+        response = self.client.get(reverse("export_appointments"), {"date_from": "2025-09-03"})
+
+        [header, row] = csv.reader(self._lines(response))
+        self.assertEqual(row[header.index("Пациент")], "'=HYPERLINK(\"http://x\")")
+        self.assertEqual(row[header.index("Телефон")], "'+79001234567")
+        self.assertEqual(row[header.index("Сумма")], "200")
+
+    def test_xlsx_is_a_workbook(self):
+        response = self.client.get(reverse("export_invoices"), {"format": "xlsx"})
+
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn("[Content_Types].xml", archive.namelist())
+        self.assertEqual(sheet.count("<row>"), 1 + 6)
+        self.assertIn("<v>100.00</v>", sheet)
+
+    def test_queries_do_not_depend_on_rows(self):
+        response = self.client.get(reverse("export_invoices"))
+        # счета одним запросом, услуги — одним запросом на порцию
+        with self.assertNumQueries(2):
+            b"".join(response.streaming_content)
+
+    def test_manager_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("export_invoices")).status_code, 302)
+
+
+class RevenueRebuildTests(TestCase):
+    """Пересборка сводки через очередь задач."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+
+    def test_view_queues_one_rebuild(self):
+        self.client.force_login(self.manager)
+
+        self.client.post(reverse("revenue_rebuild"))
+        self.client.post(reverse("revenue_rebuild"))
+
+        self.assertEqual(Job.objects.filter(name="finance.rebuild_revenue_rollup").count(), 1)
+        call_command("run_jobs", once=True, workers=1, stdout=StringIO())
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+
+
+class ReceiptTests(TestCase):
+    """Чеки оплаченных счетов: отрисовка в очереди, хранение по хэшу, долгий кэш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashier = User.objects.create_user(username="cashier", password="pass", role=User.ROLE_CASHIER)
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        doctor_user = User.objects.create_user(
+            username="doctor", password="pass", role=User.ROLE_DOCTOR, first_name="Тимур", last_name="Назаров"
+        )
+        doctor = DoctorProfile.objects.create(user=doctor_user)
+        service = Service.objects.create(name="Консультация", price=Decimal("150.00"))
+        cls.invoices = []
+        for i in range(3):
+            patient_user = User.objects.create_user(username=f"patient{i}", password="pass", role=User.ROLE_PATIENT)
+            appt = Appointment.objects.create(patient=PatientProfile.objects.create(user=patient_user))
+            AppointmentService.objects.create(appointment=appt, service=service, doctor=doctor, price=service.price)
+            cls.invoices.append(Invoice.objects.get(pk=Invoice.objects.create(appointment=appt).pk))
+        for invoice in cls.invoices:
+            invoice.recalc_total()
+
+    def setUp(self):
+        tmpdir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(RECEIPTS_ROOT=tmpdir))
+        self.root = Path(tmpdir)
+
+    def _pay(self, *invoices):
+        Invoice.objects.filter(pk__in=[invoice.pk for invoice in invoices]).mark_paid(self.cashier)
+        call_command("run_jobs", once=True, workers=1, stdout=StringIO())
+
+    def test_payment_renders_receipts_once_by_content_hash(self):
+        invoice = self.invoices[0]
+        self._pay(invoice)
+
+        receipts = {receipt.format: receipt for receipt in Receipt.objects.filter(invoice=invoice)}
+        self.assertEqual(set(receipts), {Receipt.FORMAT_HTML, Receipt.FORMAT_TEXT})
+        for fmt, receipt in receipts.items():
+            data = receipt_path(receipt.digest, fmt).read_bytes()
+            self.assertEqual(hashlib.sha256(data).hexdigest(), receipt.digest)
+            self.assertEqual(len(data), receipt.size)
+            text = data.decode()
+            self.assertIn("Консультация", text)
+            self.assertIn("150.00", text)
+            self.assertIn("Назаров", text)
+
+        # повторная отрисовка даёт то же содержимое и тот же файл
+        render_receipts(Invoice.objects.filter(pk=invoice.pk), force=True)
+        self.assertEqual(Receipt.objects.get(invoice=invoice, format=Receipt.FORMAT_HTML).digest,
+                         receipts[Receipt.FORMAT_HTML].digest)
+        self.assertEqual(len(list(self.root.rglob("*.*"))), 2)
+
+    def test_receipt_is_served_with_long_lived_cache(self):
+        self._pay(self.invoices[0])
+        self.client.force_login(self.cashier)
+
+        response = self.client.get(reverse("invoice_receipt", args=[self.invoices[0].pk]), {"format": "txt"})
+        digest = Receipt.objects.get(invoice=self.invoices[0], format=Receipt.FORMAT_TEXT).digest
+        self.assertRedirects(response, reverse("receipt_file", args=[digest, "txt"]), fetch_redirect_response=False)
+
+        response = self.client.get(response.url)
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+        self.assertIn("ЧЕК ПО СЧЁТУ", b"".join(response.streaming_content).decode())
+
+        response = self.client.get(reverse("receipt_file", args=[digest, "txt"]), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_receipt_is_rendered_on_request(self):
+        Invoice.objects.filter(pk=self.invoices[1].pk).mark_paid(self.cashier)
+        self.client.force_login(self.cashier)
+
+        response = self.client.get(reverse("invoice_receipt", args=[self.invoices[1].pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Receipt.objects.filter(invoice=self.invoices[1]).count(), 2)
+
+    def test_no_receipt_for_unpaid_invoice_or_other_roles(self):
+        url = reverse("invoice_receipt", args=[self.invoices[2].pk])
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertIn(reverse("login"), self.client.get(url).url)
+
+        self.client.force_login(self.cashier)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse("receipt_file", args=["0" * 64, "html"])).status_code, 404)
+
+    def test_batch_renders_days_receipts_in_parallel(self):
+        Invoice.objects.filter(pk__in=[invoice.pk for invoice in self.invoices]).mark_paid(self.cashier)
+        Invoice.objects.filter(pk=self.invoices[2].pk).update(paid_at=make_aware(datetime(2025, 1, 1, 12)))
+
+        call_command("render_receipts", workers=2, stdout=StringIO())
+
+        self.assertEqual(
+            set(Receipt.objects.values_list("invoice_id", flat=True)),
+            {self.invoices[0].pk, self.invoices[1].pk},
+        )
+        self.assertEqual(len(list(self.root.rglob("*.html"))), 2)
+        for receipt in Receipt.objects.all():
+            self.assertTrue(receipt_path(receipt.digest, receipt.format).exists())
@@ -4,4 +4,12 @@ from . import views
 urlpatterns = [
     path('appointments/create/<int:user_id>/', views.appointment_create, name='appointment_create'),
     path("invoices/", views.invoice_list, name="invoice_list"),
+    path("invoices/<int:pk>/pay/", views.mark_invoice_paid, name="confirm_invoice_payment"),
+    path("invoices/<int:pk>/receipt/", views.invoice_receipt, name="invoice_receipt"),
+    path("receipts/<slug:digest>.<slug:fmt>", views.receipt_file, name="receipt_file"),
+    path("exports/invoices/", views.export_invoices, name="export_invoices"),
+    path("exports/appointments/", views.export_appointments, name="export_appointments"),
+    path("reports/revenue/", views.revenue_report, name="revenue_report"),
+    path("reports/revenue/rebuild/", views.revenue_rebuild, name="revenue_rebuild"),
+    path("doctors/<int:doctor_id>/availability/", views.doctor_availability, name="doctor_availability"),
 ]
@@ -1,24 +1,39 @@
-from django.db.models import Prefetch
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Sum
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from users.models import PatientProfile, User, DoctorProfile
+from users.models import PatientProfile, DoctorProfile, display_name
 from service.models import Service
-from .models import Appointment, Invoice, AppointmentService
+from service.catalog import get_catalog
+from .models import Appointment, Invoice, AppointmentService, DailyRevenue, Receipt
+from .forms import InvoiceFilterForm, ExportForm, RevenueReportForm
+from .exports import invoice_rows, appointment_rows, streaming_response
+from .receipts import CONTENT_TYPES, receipt_path, render_receipts
+from .availability import load_schedules
+from .tasks import rebuild_revenue_rollup
+from med_clinic import audit
+from med_clinic.data_versions import bump_data_version, APPOINTMENT_SERVICE
 from users.views import manager_required, cashier_required
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, Http404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST, etag
 from django.db import transaction
-from django.utils.timezone import now, make_aware
-from datetime import datetime
+from django.utils.timezone import now, make_aware, localdate, localtime
+from datetime import datetime, date, timedelta
 
 
 @manager_required
 def appointment_create(request, user_id):
-    user = get_object_or_404(User, id=user_id)
-    patient = get_object_or_404(PatientProfile, user=user)
+    patient = get_object_or_404(PatientProfile.objects.select_related("user"), user_id=user_id)
 
     if request.method == "POST":
-        selected_services_str = request.POST.get("services", "")
-        selected_services_ids = selected_services_str.split(',') if selected_services_str else []
+        # услуги приходят либо скрытыми inputs "services", либо строкой через запятую
+        selected_services_ids = [
+            sid.strip()
+            for value in request.POST.getlist("services")
+            for sid in value.split(',')
+            if sid.strip()
+        ]
 
         appointment_date_str = request.POST.get("date")
 
@@ -38,87 +53,275 @@ def appointment_create(request, user_id):
             messages.error(request, "Неверный формат даты.")
             return redirect("appointment_create", user_id=user_id)
 
+        try:
+            selected_services_ids = [int(sid) for sid in selected_services_ids]
+        except ValueError:
+            messages.error(request, "Неверный идентификатор услуги.")
+            return redirect("appointment_create", user_id=user_id)
+
+        # услуги и допустимые пары (услуга, врач) берём из кэша каталога
+        catalog = get_catalog()
+        if any(sid not in catalog.services for sid in selected_services_ids):
+            messages.error(request, "Одна из выбранных услуг не найдена.")
+            return redirect("appointment_create", user_id=user_id)
+
+        # запрошенные врачи по услугам
+        requested_doctors = {}
+        for sid in selected_services_ids:
+            doctor_id = request.POST.get(f"doctor_for_{sid}", "")
+            if doctor_id.isdigit():
+                requested_doctors[sid] = int(doctor_id)
+
+        # врач и время для каждой услуги: услуги одного врача идут подряд
+        planned = []
+        doctor_busy_until = {}
+        for sid in selected_services_ids:
+            service = catalog.services[sid]
+            doctor_id = requested_doctors.get(sid)
+            if not catalog.is_eligible(sid, doctor_id):
+                doctor_id = None
+            starts_at = doctor_busy_until.get(doctor_id, aware_appointment_date)
+            ends_at = starts_at + timedelta(minutes=service.duration_minutes)
+            if doctor_id is not None:
+                doctor_busy_until[doctor_id] = ends_at
+            planned.append((service, doctor_id, starts_at, ends_at))
+
         try:
             with transaction.atomic():
+                # врачи должны работать в это время и не быть заняты другим приёмом.
+                # Проверка внутри транзакции: с transaction_mode=IMMEDIATE она сразу
+                # берёт блокировку записи, и параллельная запись на тот же слот
+                # дождётся коммита и увидит эту бронь
+                if doctor_busy_until:
+                    schedules = load_schedules(doctor_busy_until, localdate(aware_appointment_date))
+                    for doctor_id, busy_until in doctor_busy_until.items():
+                        if not schedules[doctor_id].is_available(aware_appointment_date, busy_until):
+                            messages.error(
+                                request,
+                                f"Врач {catalog.doctor_names.get(doctor_id, doctor_id)} "
+                                f"занят или не работает в выбранное время."
+                            )
+                            return redirect("appointment_create", user_id=user_id)
+
                 # создаём приём
                 appt = Appointment.objects.create(
                     patient=patient,
                     appointment_date=aware_appointment_date,
                 )
 
+                # цена — действующая на время оказания услуги (с учётом запланированных изменений)
+                items = []
                 total = 0
-                services_qs = Service.objects.prefetch_related('doctors__user')
-
-                for sid in selected_services_ids:
-                    service = get_object_or_404(services_qs, id=sid)
-
-                    doctor_id = request.POST.get(f"doctor_for_{sid}")
-                    doctor = None
-                    if doctor_id and service.doctors.filter(id=doctor_id).exists():
-                        doctor = DoctorProfile.objects.get(id=doctor_id)
-
-                    AppointmentService.objects.create(
+                for service, doctor_id, starts_at, ends_at in planned:
+                    price = service.price_at(starts_at)
+                    items.append(AppointmentService(
                         appointment=appt,
-                        service=service,
-                        doctor=doctor,
-                        price=service.price,
-                    )
-                    total += service.price
+                        service_id=service.id,
+                        doctor_id=doctor_id,
+                        price=price,
+                        starts_at=starts_at,
+                        ends_at=ends_at,
+                    ))
+                    total += price
+
+                AppointmentService.objects.bulk_create(items)
+                # bulk_create не шлёт сигналов
+                audit.record_created(items)
+                bump_data_version(APPOINTMENT_SERVICE)
 
                 # создаём единый счёт на весь приём
-                invoice = Invoice.objects.create(
+                Invoice.objects.create(
                     appointment=appt,
                     total_amount=total,
                     status="ожидает оплаты"
                 )
+                DailyRevenue.record_billed(items)
 
-                # привязка к приёму
-                appt.invoice = invoice
-                appt.save()
-
-                messages.success(request, "Приём создан, счёт выставлен.")
-                return redirect("manager_dashboard")
+            messages.success(request, "Приём создан, счёт выставлен.")
+            return redirect("manager_dashboard")
 
         except Exception as e:
             messages.error(request, f"Произошла ошибка: {e}")
             return redirect("appointment_create", user_id=user_id)
 
     else:
-        services_qs = Service.objects.prefetch_related('doctors__user')
-        return render(request, "finance/appointment.html", {
-            "patient": patient,
-            "services": services_qs,
-        })
+        # услуги и врачи подгружаются из JSON API каталога (service.views) —
+        # браузер кэширует их и только перепроверяет по ETag
+        return render(request, "finance/appointment.html", {"patient": patient})
+
+
+@manager_required
+def doctor_availability(request, doctor_id):
+    """Свободные слоты врача на день (JSON для формы записи)"""
+    doctor = get_object_or_404(DoctorProfile, id=doctor_id)
+    try:
+        day = date.fromisoformat(request.GET.get("date", ""))
+        duration = timedelta(minutes=int(request.GET.get("duration", 30)))
+    except ValueError:
+        return JsonResponse({"error": "Неверная дата или длительность."}, status=400)
+    if duration <= timedelta(0):
+        return JsonResponse({"error": "Неверная дата или длительность."}, status=400)
+
+    schedule = load_schedules([doctor.id], day)[doctor.id]
+    return JsonResponse({
+        "doctor": doctor.id,
+        "date": day.isoformat(),
+        "free": [
+            {"start": localtime(start).isoformat(), "end": localtime(end).isoformat()}
+            for start, end in schedule.free_windows()
+        ],
+        "slots": [localtime(slot).strftime("%H:%M") for slot in schedule.free_slots(duration)],
+    })
 
 
 @cashier_required
+@require_POST
 def mark_invoice_paid(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk, status="ожидает оплаты")
-    invoice.status = "оплачено"
-    invoice.paid_at = now()
-    invoice.confirmed_by = request.user  # <-- вот это добавляем
-    invoice.save()
-    messages.success(request, f"Счёт за приём №{invoice.appointment.id} оплачен кассиром {request.user.get_full_name()}.")
-    return redirect("unpaid_invoices")
+    if Invoice.objects.filter(pk=pk).mark_paid(request.user):
+        messages.success(request, f"Счёт #{pk} оплачен кассиром {display_name(request.user)}.")
+    else:
+        get_object_or_404(Invoice, pk=pk)
+        messages.warning(request, f"Счёт #{pk} уже оплачен.")
+    return redirect("invoice_list")
+
+
+# имя файла чека — хэш содержимого, поэтому его можно кэшировать «навсегда»
+RECEIPT_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@cashier_required
+def invoice_receipt(request, pk):
+    """Чек оплаченного счёта (?format=txt — для чекового принтера): переадресация на файл чека"""
+    fmt = request.GET.get("format", Receipt.FORMAT_HTML)
+    if fmt not in CONTENT_TYPES:
+        raise Http404("Неизвестный формат чека.")
+    receipt = Receipt.objects.filter(invoice_id=pk, format=fmt).only("digest").first()
+    if receipt is None:
+        # задача из очереди ещё не успела — рисуем сейчас (для неоплаченного счёта чека не будет)
+        render_receipts(Invoice.objects.filter(pk=pk))
+        receipt = get_object_or_404(Receipt.objects.only("digest"), invoice_id=pk, format=fmt)
+    return redirect("receipt_file", digest=receipt.digest, fmt=fmt)
+
+
+@cashier_required
+@cache_control(private=True, max_age=RECEIPT_MAX_AGE, immutable=True)
+@etag(lambda request, digest, fmt: digest)
+def receipt_file(request, digest, fmt):
+    """Файл чека по хэшу содержимого; содержимое по этому адресу никогда не меняется"""
+    if fmt not in CONTENT_TYPES or not Receipt.objects.filter(digest=digest, format=fmt).exists():
+        raise Http404("Чек не найден.")
+    try:
+        return FileResponse(open(receipt_path(digest, fmt), "rb"), content_type=CONTENT_TYPES[fmt])
+    except FileNotFoundError:
+        raise Http404("Чек не найден.")
+
+
+INVOICES_PAGE_SIZE = 20
 
 
 def invoice_list(request):
+    filter_form = InvoiceFilterForm(request.GET)
+
     invoices = (
         Invoice.objects
-        .select_related("appointment__patient__user")
+        .select_related("appointment__patient__user", "confirmed_by")
         .prefetch_related(
             Prefetch(
                 "appointment__services",   # правильный related_name
                 queryset=AppointmentService.objects.select_related("service", "doctor__user")
             )
         )
+        .order_by("-created_at", "-id")
     )
+    invoices = filter_form.filter(invoices)
+
+    # Сумма поддерживается при изменении услуг (finance.signals), здесь только чтение
+    page = Paginator(invoices, INVOICES_PAGE_SIZE).get_page(request.GET.get("page"))
+
+    # фильтры без номера страницы — для ссылок пагинации
+    filters = request.GET.copy()
+    filters.pop("page", None)
+
+    return render(request, "finance/invoice_list.html", {
+        "invoices": page.object_list,
+        "page_obj": page,
+        "filter_form": filter_form,
+        "filters": filters.urlencode(),
+    })
 
-    # Пересчёт суммы (если ещё не пересчитана)
-    for invoice in invoices:
-        if not invoice.total_amount:
-            total = sum(s.price for s in invoice.appointment.services.all())
-            invoice.total_amount = total
-            invoice.save(update_fields=["total_amount"])
 
-    return render(request, "finance/invoice_list.html", {"invoices": invoices})
\ No newline at end of file
+@manager_required
+def export_invoices(request):
+    """Счета с услугами за период потоком в CSV или XLSX (?format=xlsx)"""
+    form = ExportForm(request.GET)
+    invoices = form.filter(Invoice.objects.order_by("created_at", "id"))
+    # снимок каталога строим до начала отдачи: цены по прейскуранту берутся из него
+    rows = invoice_rows(invoices, get_catalog())
+    return streaming_response(rows, form.get_format(), f"invoices-{localdate()}", sheet="Счета")
+
+
+@manager_required
+def export_appointments(request):
+    """Приёмы за период потоком в CSV или XLSX (?format=xlsx)"""
+    form = ExportForm(request.GET)
+    appointments = form.filter_appointments(Appointment.objects.order_by("appointment_date", "id"))
+    return streaming_response(
+        appointment_rows(appointments), form.get_format(), f"appointments-{localdate()}", sheet="Приёмы"
+    )
+
+
+@manager_required
+@require_POST
+def revenue_rebuild(request):
+    """Поставить пересборку сводки выручки в очередь (выполнит run_jobs)"""
+    if rebuild_revenue_rollup.enqueue(unique=True):
+        messages.success(request, "Пересборка сводки поставлена в очередь.")
+    else:
+        messages.info(request, "Пересборка сводки уже ожидает выполнения.")
+    return redirect("revenue_report")
+
+
+@manager_required
+def revenue_report(request):
+    """Выручка за период по дням, врачам или услугам — только из сводки DailyRevenue"""
+    form = RevenueReportForm(request.GET or None)
+    date_from, date_to, group_by = form.period()
+
+    rows = list(
+        DailyRevenue.objects
+        .filter(day__range=(date_from, date_to))
+        .values(group_by)
+        .annotate(
+            items=Sum("items_count"),
+            billed=Sum("billed_amount"),
+            paid_count=Sum("paid_count"),
+            paid=Sum("paid_amount"),
+        )
+        .order_by(group_by)
+    )
+
+    # подписи для врачей и услуг — только по id, попавшим в отчёт
+    if group_by == "doctor_id":
+        doctors = DoctorProfile.objects.select_related("user").in_bulk([row[group_by] for row in rows])
+        for row in rows:
+            doctor = doctors.get(row[group_by])
+            row["label"] = display_name(doctor.user) if doctor else "Без врача"
+    elif group_by == "service_id":
+        services = Service.objects.only("name").in_bulk([row[group_by] for row in rows])
+        for row in rows:
+            service = services.get(row[group_by])
+            row["label"] = service.name if service else f"Услуга #{row[group_by]} (удалена)"
+    else:
+        for row in rows:
+            row["label"] = row[group_by]
+
+    totals = {
+        key: sum(row[key] for row in rows)
+        for key in ("items", "billed", "paid_count", "paid")
+    }
+    return render(request, "finance/revenue_report.html", {
+        "form": form,
+        "rows": rows,
+        "totals": totals,
+        "group_by": group_by,
+    })
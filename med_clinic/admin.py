@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import AuditEntry, Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    """Read-only: the audit journal is append-only."""
+    list_display = ('created_at', 'actor_name', 'model', 'object_id', 'action')
+    list_filter = ('model', 'action')
+    search_fields = ('=object_id', 'actor_name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,66 @@
+"""
+Helpers for async views.
+
+Django's async ORM (aget, acount, async for, ...) sends every query through
+sync_to_async(thread_sensitive=True): all of a request's queries run one
+after another on one thread and one connection, so gathering several ORM
+awaitables does not overlap them. gather_reads() runs independent read-only
+callables on separate worker threads instead, each with its own database
+connection, and awaits them together.
+
+Inside a transaction (ATOMIC_REQUESTS, TestCase) other connections would not
+see the transaction's uncommitted writes, so the reads then run one after
+another on the current connection.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator, Page
+from django.db import connection, close_old_connections
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def _read(func):
+    # worker threads keep their connections between calls; like the request
+    # signals do, drop the ones past CONN_MAX_AGE or broken
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather_reads(*funcs):
+    """Call the read-only callables concurrently and return their results in order."""
+    if await sync_to_async(_in_transaction)():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(sync_to_async(_read, thread_sensitive=False)(func) for func in funcs))
+
+
+def _page_number(number):
+    try:
+        return max(int(number), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+async def apaginate(queryset, per_page, number):
+    """
+    Async Paginator.get_page(): the count and the requested page are read
+    concurrently. A page past the end is answered with the last page.
+    """
+    paginator = Paginator(queryset, per_page)
+    number = _page_number(number)
+
+    def rows(page_number):
+        offset = (page_number - 1) * per_page
+        return lambda: list(queryset[offset:offset + per_page])
+
+    paginator.count, object_list = await gather_reads(queryset.count, rows(number))
+    if number > paginator.num_pages:
+        number = paginator.num_pages
+        [object_list] = await gather_reads(rows(number))
+    return Page(object_list, number, paginator)
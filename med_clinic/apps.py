@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
+
+
+class MedClinicConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'med_clinic'
+
+    def ready(self):
+        from .db import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='med_clinic.sqlite_pragmas')
+        # register the jobs of every app (med_clinic.jobs)
+        autodiscover_modules('tasks')
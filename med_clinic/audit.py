@@ -0,0 +1,188 @@
+"""
+Append-only audit journal (med_clinic.models.AuditEntry).
+
+track(Model, fields) records the creation of a row, changes of the given
+fields and the deletion of the row. Code that changes rows without signals
+(UPDATE querysets, bulk_create) records the change itself with record() or
+record_created().
+
+Entries are written behind: record() only puts the entry in an in-memory
+buffer, so the payment and booking transactions carry no extra writes. An
+entry made inside a transaction joins the buffer when the transaction
+commits, and a rolled-back change leaves no entry. The buffer is written
+with one bulk INSERT after the response has been sent (request_finished),
+as soon as it holds AUDIT_BATCH_SIZE entries, and at process exit. Entries
+of a process that is killed before any of these are lost.
+
+The actor of an entry is the user of the current request (AuditMiddleware)
+unless one is given explicitly.
+"""
+import atexit
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.utils.timezone import now
+
+from .models import AuditEntry
+
+logger = logging.getLogger('med_clinic.audit')
+
+# returns the current actor; a function rather than the user itself, since
+# asgiref compares context values and that would resolve a lazy request.user
+_actor = contextvars.ContextVar('audit_actor', default=lambda: None)
+_lock = threading.Lock()
+# (database alias, entry) pairs waiting to be written
+_buffer = []
+# model -> attnames of the audited fields
+_tracked = {}
+
+
+def _batch_size():
+    return getattr(settings, 'AUDIT_BATCH_SIZE', 500)
+
+
+@contextmanager
+def acting_as(user):
+    """Make user the actor of the entries recorded inside the block."""
+    token = _actor.set(lambda: user)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+def _entry(model, object_id, action, changes, actor):
+    actor = _actor.get()() if actor is None else actor
+    authenticated = actor is not None and actor.is_authenticated
+    return AuditEntry(
+        created_at=now(),
+        actor_id=actor.pk if authenticated else None,
+        actor_name=actor.get_username() if authenticated else '',
+        model=model._meta.label_lower,
+        object_id=object_id,
+        action=action,
+        changes=changes or {},
+    )
+
+
+def _add(entries, using):
+    def buffer():
+        with _lock:
+            _buffer.extend((using, entry) for entry in entries)
+            full = len(_buffer) >= _batch_size()
+        if full:
+            flush()
+
+    if connections[using].in_atomic_block:
+        transaction.on_commit(buffer, using=using)
+    else:
+        buffer()
+
+
+def record(model, object_ids, action, changes=None, actor=None, using=DEFAULT_DB_ALIAS):
+    """Record the same change of one or more rows of model (class or instance)."""
+    if isinstance(object_ids, int):
+        object_ids = [object_ids]
+    _add([_entry(model, object_id, action, changes, actor) for object_id in object_ids], using)
+
+
+def _values(instance, fields):
+    # deferred fields are left out rather than loaded
+    return {field: instance.__dict__[field] for field in fields if field in instance.__dict__}
+
+
+def _created(instance, fields):
+    return {field: [None, value] for field, value in _values(instance, fields).items() if value is not None}
+
+
+def record_created(objs, actor=None):
+    """Record rows created with bulk_create() (they must have their pk)."""
+    objs = [obj for obj in objs if type(obj) in _tracked]
+    if objs:
+        _add(
+            [
+                _entry(obj, obj.pk, AuditEntry.ACTION_CREATE, _created(obj, _tracked[type(obj)]), actor)
+                for obj in objs
+            ],
+            objs[0]._state.db or DEFAULT_DB_ALIAS,
+        )
+
+
+def flush(**kwargs):
+    """Write the buffered entries; returns how many were written."""
+    with _lock:
+        pending = _buffer[:]
+        _buffer.clear()
+    by_alias = {}
+    for using, entry in pending:
+        by_alias.setdefault(using, []).append(entry)
+
+    written = 0
+    for using, entries in by_alias.items():
+        if using not in connections.settings:
+            # a temporary database whose owner did not discard() its entries
+            logger.warning('dropped %s audit entries of the removed database %r', len(entries), using)
+            continue
+        try:
+            AuditEntry.objects.using(using).bulk_create(entries, batch_size=_batch_size())
+        except Exception:
+            logger.exception('failed to write %s audit entries, keeping them for the next flush', len(entries))
+            with _lock:
+                _buffer[:0] = [(using, entry) for entry in entries]
+        else:
+            written += len(entries)
+    return written
+
+
+def discard(using):
+    """Drop the buffered entries of a database that is going away; returns how many."""
+    with _lock:
+        kept = [(alias, entry) for alias, entry in _buffer if alias != using]
+        dropped = len(_buffer) - len(kept)
+        _buffer[:] = kept
+    return dropped
+
+
+def track(model, fields):
+    """Audit creations, changes of fields and deletions of the model's rows."""
+    fields = [model._meta.get_field(name).attname for name in fields]
+    _tracked[model] = fields
+
+    def remember(sender, instance, **kwargs):
+        instance._audit_values = _values(instance, fields)
+
+    def saved(sender, instance, created, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+        if raw:
+            return
+        current = _values(instance, fields)
+        if created:
+            record(instance, instance.pk, AuditEntry.ACTION_CREATE, _created(instance, fields), using=using)
+        else:
+            previous = getattr(instance, '_audit_values', {})
+            changes = {
+                field: [previous[field], value]
+                for field, value in current.items()
+                if field in previous and previous[field] != value
+            }
+            if changes:
+                record(instance, instance.pk, AuditEntry.ACTION_UPDATE, changes, using=using)
+        instance._audit_values = current
+
+    def deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+        changes = {field: [value, None] for field, value in _values(instance, fields).items()}
+        record(instance, instance.pk, AuditEntry.ACTION_DELETE, changes, using=using)
+
+    uid = f'audit:{model._meta.label_lower}'
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
+
+
+request_finished.connect(flush, dispatch_uid='med_clinic.audit.flush')
+atexit.register(flush)
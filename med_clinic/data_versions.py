@@ -0,0 +1,51 @@
+"""
+Per-table data versions for template fragment caching.
+
+A version is a random token kept under ``data_version:<name>`` in the
+default cache, which every worker process shares (settings.CACHES): a bump
+in the worker that made the write retires the fragments in all of them.
+Model signals (and the few bulk writes that bypass signals) bump the
+version of the data they change, and templates put the current versions
+into the ``{% cache %}`` key:
+
+    {% load cache data_versions %}
+    {% data_version "invoice" "service" as rows_version %}
+    {% cache 600 invoice_rows rows_version request.get_full_path %}...{% endcache %}
+
+A bump makes every cached fragment built from that data unreachable at
+once, so a repeated page view costs one cache lookup until something
+actually changes. Data without a version (user names edited in the admin)
+is refreshed by the fragment timeout.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+SERVICE = 'service'
+INVOICE = 'invoice'
+APPOINTMENT_SERVICE = 'appointment_service'
+
+_KEY = 'data_version:{}'
+
+
+def data_version(*names):
+    """Combined current version of the named tables."""
+    keys = [_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid4().hex[:12]
+            versions[key] = token if cache.add(key, token, None) else cache.get(key, token)
+    return '.'.join(versions[key] for key in keys)
+
+
+def bump_data_version(*names):
+    """Invalidate every fragment built from the named tables."""
+    def bump():
+        cache.set_many({_KEY.format(name): uuid4().hex[:12] for name in names}, None)
+
+    # now, so this process does not serve the old fragment inside the transaction,
+    # and after commit, so others do not cache uncommitted rows under the new version
+    bump()
+    transaction.on_commit(bump)
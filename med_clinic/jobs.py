@@ -0,0 +1,149 @@
+"""
+Durable job queue in the database.
+
+Side effects that do not have to finish before the response (report
+rebuilds, notifications, documents) are queued as jobs instead of being run
+in the view, and ``manage.py run_jobs`` executes them::
+
+    # finance/tasks.py
+    @task('finance.rebuild_revenue_rollup', max_attempts=3)
+    def rebuild_revenue_rollup():
+        ...
+
+    # a view
+    rebuild_revenue_rollup.enqueue()
+
+A job is a row in the same database, so enqueueing inside a transaction is
+atomic with the data it refers to: the job becomes visible to workers when
+the transaction commits and disappears if it rolls back.
+
+A worker claims due jobs with a conditional UPDATE and holds them for
+``JOB_VISIBILITY_TIMEOUT`` seconds; if it dies, the jobs become due again
+after that. A failing job is retried with exponential backoff
+(``JOB_RETRY_BACKOFF`` seconds, doubled per attempt) until ``max_attempts``,
+then left as failed with its traceback in ``last_error``.
+
+``tasks`` modules of the installed apps are imported at startup, so every
+task is registered in the web process and in the worker.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from .models import Job
+
+logger = logging.getLogger('med_clinic.jobs')
+
+MAX_BACKOFF = timedelta(hours=1)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, delay=None, unique=False, **kwargs):
+        return enqueue(self.name, kwargs, delay=delay, unique=unique)
+
+
+def task(name, max_attempts=5):
+    """Register a function as a task; keyword arguments must be JSON-serializable."""
+    def decorator(func):
+        registered = _registry[name] = Task(func, name, max_attempts)
+        return registered
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Unknown task: {name}') from None
+
+
+def enqueue(name, payload=None, delay=None, unique=False):
+    """
+    Queue a call of the task. With unique=True nothing is queued while a job
+    of this task with the same payload is already waiting; returns the Job or None.
+    """
+    registered = get_task(name)
+    payload = payload or {}
+    if unique and Job.objects.filter(name=name, payload=payload, status=Job.STATUS_QUEUED).exists():
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=now() + (delay or timedelta(0)),
+        max_attempts=registered.max_attempts,
+    )
+
+
+def _visibility_timeout():
+    return timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 300))
+
+
+def _backoff(attempt):
+    base = timedelta(seconds=getattr(settings, 'JOB_RETRY_BACKOFF', 30))
+    delay = min(base * 2 ** (attempt - 1), MAX_BACKOFF)
+    # jitter, so jobs failing together do not retry together
+    return delay * random.uniform(1, 1.1)
+
+
+def claim(worker, limit):
+    """Take up to limit due jobs for this worker."""
+    moment = now()
+    due = (
+        Q(status=Job.STATUS_QUEUED, run_at__lte=moment)
+        | Q(status=Job.STATUS_RUNNING, locked_until__lt=moment)
+    )
+    with transaction.atomic():
+        ids = list(Job.objects.filter(due).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # the same condition again: a job another worker took in between is skipped
+        Job.objects.filter(due, id__in=ids).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker,
+            locked_until=moment + _visibility_timeout(),
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=worker, status=Job.STATUS_RUNNING).order_by('run_at', 'id'))
+
+
+def run_job(job, worker):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=worker, status=Job.STATUS_RUNNING)
+    try:
+        get_task(job.name)(**job.payload)
+    except Exception:
+        retry = job.attempts < job.max_attempts
+        mine.update(
+            status=Job.STATUS_QUEUED if retry else Job.STATUS_FAILED,
+            run_at=now() + _backoff(job.attempts) if retry else job.run_at,
+            finished_at=None if retry else now(),
+            locked_by='',
+            locked_until=None,
+            last_error=traceback.format_exc(),
+        )
+        logger.warning('job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts, exc_info=True)
+        return False
+    mine.update(status=Job.STATUS_DONE, finished_at=now(), locked_by='', locked_until=None)
+    return True
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Delete done jobs finished before the cutoff. Failed jobs are kept for inspection."""
+    deleted, _ = Job.objects.filter(status=Job.STATUS_DONE, finished_at__lt=now() - older_than).delete()
+    return deleted
@@ -0,0 +1,97 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from med_clinic.jobs import claim, run_job, purge_finished
+
+PURGE_EVERY = timedelta(hours=1).total_seconds()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued jobs (med_clinic.jobs). Jobs are executed by a pool of threads; "
+        "SIGTERM or Ctrl+C stops claiming new jobs and waits for the running ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Jobs run at the same time (threads)")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between polls when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due now and exit")
+        parser.add_argument("--keep-days", type=int, default=7, help="Delete done jobs older than this")
+
+    def handle(self, *args, **options):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        self.done = self.failed = 0
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        if options["workers"] <= 1:
+            self._run_inline(options)
+        else:
+            self._run_pool(options)
+
+        self.stdout.write(self.style.SUCCESS(f"Jobs done: {self.done}, failed: {self.failed}."))
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Stopping after the running jobs...")
+        self.stopping = True
+
+    def _purge(self, options, last_purge):
+        if time.monotonic() - last_purge < PURGE_EVERY:
+            return last_purge
+        purge_finished(timedelta(days=options["keep_days"]))
+        return time.monotonic()
+
+    def _record(self, ok):
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+
+    def _run_inline(self, options):
+        last_purge = -PURGE_EVERY
+        while not self.stopping:
+            last_purge = self._purge(options, last_purge)
+            jobs = claim(self.worker, 1)
+            for job in jobs:
+                self._record(run_job(job, self.worker))
+            if not jobs:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+
+    def _execute(self, job):
+        try:
+            return run_job(job, self.worker)
+        finally:
+            # each thread has its own connection
+            connections.close_all()
+
+    def _run_pool(self, options):
+        last_purge = -PURGE_EVERY
+        running = set()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                if not self.stopping:
+                    last_purge = self._purge(options, last_purge)
+                    free = options["workers"] - len(running)
+                    jobs = claim(self.worker, free) if free else []
+                    running.update(pool.submit(self._execute, job) for job in jobs)
+                    if not jobs and not running and options["once"]:
+                        return
+                elif not running:
+                    return
+
+                finished, running = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._record(future.result())
+                if not finished and not running:
+                    time.sleep(options["poll"])
@@ -0,0 +1,171 @@
+"""
+Per-request SQL instrumentation.
+
+Every request is timed and its queries are counted through
+connection.execute_wrapper, so it works with DEBUG off, under WSGI as well as
+for the async views served over ASGI. One structured log line is written per
+request to the ``med_clinic.sql`` logger:
+
+    view=users.views.cashier_dashboard status=200 queries=4 duplicates=0
+    similar=1 sql_ms=1.8 app_ms=12.4 total_ms=14.2
+
+``duplicates`` counts queries repeated with the same SQL and parameters,
+``similar`` is the largest number of queries sharing the same SQL with
+different parameters (the usual N+1 signature). ``app_ms`` is the time spent
+outside the database, i.e. the view and template rendering.
+
+Requests over ``SQL_QUERY_BUDGET`` queries, or with duplicated queries, are
+logged at WARNING. With ``SQL_TIMING_HEADER`` enabled the numbers are also
+sent in a ``Server-Timing`` header, which browser dev tools display.
+"""
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .audit import acting_as
+
+logger = logging.getLogger('med_clinic.sql')
+
+
+class QueryRecorder:
+    """execute_wrapper that remembers every query and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, _freeze(params), time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return sum(n - 1 for n in counts.values() if n > 1)
+
+    @property
+    def similar(self):
+        counts = Counter(sql for sql, _, _ in self.queries)
+        return max(counts.values(), default=0)
+
+
+def _freeze(params):
+    if isinstance(params, (list, tuple)):
+        return tuple(_freeze(p) for p in params)
+    if isinstance(params, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in params.items()))
+    try:
+        hash(params)
+    except TypeError:
+        return repr(params)
+    return params
+
+
+class SQLBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budget = getattr(settings, 'SQL_QUERY_BUDGET', 30)
+        self.header = getattr(settings, 'SQL_TIMING_HEADER', False)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        return self._report(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # connections are per thread: the async ORM runs the request's queries
+        # on the thread of sync_to_async(thread_sensitive=True), so the recorder
+        # is installed on that thread's connection. Reads that gather_reads()
+        # sends to other connections are not counted.
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        await sync_to_async(_add_wrapper)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(recorder)
+        return self._report(request, response, recorder, time.perf_counter() - start)
+
+    def _report(self, request, response, recorder, total):
+        sql_time = recorder.total_time
+        stats = {
+            'view': _view_name(request),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'duplicates': recorder.duplicates,
+            'similar': recorder.similar,
+            'sql_ms': round(sql_time * 1000, 1),
+            'app_ms': round((total - sql_time) * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        level = logging.WARNING if recorder.count > self.budget or recorder.duplicates else logging.INFO
+        logger.log(level, ' '.join(f'{key}={value}' for key, value in stats.items()), extra={'sql_stats': stats})
+
+        if self.header:
+            response['Server-Timing'] = (
+                f'sql;dur={stats["sql_ms"]};desc="{recorder.count} queries, {recorder.duplicates} duplicates", '
+                f'app;dur={stats["app_ms"]}'
+            )
+        return response
+
+
+# looked up inside sync_to_async, so that they reach that thread's connection
+def _add_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+class AuditMiddleware:
+    """The request's user is the actor of the audit entries recorded while handling it (med_clinic.audit)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # request.user stays lazy: it is resolved only if something is recorded
+        with acting_as(getattr(request, 'user', None)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # the actor is a context variable, so the ORM's worker threads see it too
+        with acting_as(getattr(request, 'user', None)):
+            return await self.get_response(request)
@@ -0,0 +1,25 @@
+"""
+Process pools for CPU-bound work in management commands.
+
+A worker process may start without Django configured (the spawn start
+method), so every worker runs django.setup() before taking work.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def process_pool(workers):
+    """ProcessPoolExecutor whose workers have Django set up."""
+    settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'med_clinic.settings')
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings_module,))
+
+
+def chunk_size(count, workers):
+    """Items per task: about four chunks per worker."""
+    return max(count // (workers * 4), 1)
@@ -39,21 +39,28 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'users',
     'finance',
-    'service'
+    'service',
+    'med_clinic',
 ]
 
 MIDDLEWARE = [
+    'med_clinic.middleware.SQLBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'med_clinic.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'med_clinic.urls'
 
+# OPTIONS['loaders'] is left unset on purpose: Django then wraps the filesystem
+# and app loaders in the cached loader, so templates are compiled once per
+# process (in development the cache is reset when a template changes).
+# Rendered fragments are cached per data version, see med_clinic.data_versions.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -71,6 +78,27 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'med_clinic.wsgi.application'
+# The doctor and patient dashboards are async views (see med_clinic.aio);
+# serve them with an ASGI server, e.g. `uvicorn med_clinic.asgi:application`
+ASGI_APPLICATION = 'med_clinic.asgi.application'
+
+# Per-request SQL instrumentation (med_clinic.middleware.SQLBudgetMiddleware):
+# requests over the budget or with duplicated queries are logged as warnings,
+# and the timings are exposed in a Server-Timing header while DEBUG is on.
+SQL_QUERY_BUDGET = 30
+SQL_TIMING_HEADER = DEBUG
+
+# Job queue (med_clinic.jobs, manage.py run_jobs): seconds a claimed job stays
+# hidden from other workers, and the first retry delay (doubled per attempt)
+JOB_VISIBILITY_TIMEOUT = 300
+JOB_RETRY_BACKOFF = 30
+
+# Audit journal (med_clinic.audit): buffered entries are written after the
+# response, or as soon as this many are waiting
+AUDIT_BATCH_SIZE = 500
+
+# Rendered invoice receipts (finance.receipts), named by the sha256 of their content
+RECEIPTS_ROOT = BASE_DIR / 'receipts'
 
 
 # Database
@@ -80,9 +108,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # keep the connection between requests and check it before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # take the write lock at BEGIN: a transaction that reads first and
+            # writes later cannot fail on lock upgrade, it waits like any writer
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
     }
 }
 
+# Applied to every new SQLite connection (med_clinic.db.apply_sqlite_pragmas)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms
+    'cache_size': -20000,          # negative = KiB, i.e. ~20 MB per connection
+    'mmap_size': 134217728,        # 128 MB
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,4 +171,30 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'users.User'
+
+# One cache for all worker processes. Sessions, the logged-in user, the
+# service catalog version and the fragment data versions are invalidated
+# through it, so a per-process cache (LocMem) would let every other worker
+# keep serving the old data. The database is SQLite, so all processes run on
+# this host and a directory is enough; use Redis or memcached once the app
+# runs on several hosts. The tests use a temporary directory
+# (med_clinic.test_runner).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            # culling scans the directory; keep it rare
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+TEST_RUNNER = 'med_clinic.test_runner.TestRunner'
+
+# Sessions are read from the cache and written through to the database;
+# the logged-in user is cached by users.backends.CachedModelBackend, so
+# request.user and role checks need no queries on a warm cache.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 3600
\ No newline at end of file
@@ -0,0 +1,11 @@
+from django import template
+
+from med_clinic.data_versions import data_version as current_version
+
+register = template.Library()
+
+
+@register.simple_tag
+def data_version(*names):
+    """{% data_version "invoice" "service" as version %} — key part for {% cache %}."""
+    return current_version(*names)
@@ -0,0 +1,44 @@
+"""
+Test runner with a cache of its own.
+
+The default cache lives in a directory shared by all processes
+(settings.CACHES), so it outlives a test run. Fragments and versions left
+there by the site or by an earlier run would leak into the tests; the run
+gets an empty temporary directory instead. Process pools forked by the
+tests inherit the overridden settings and share that directory.
+"""
+import copy
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.mkdtemp(prefix='med_clinic-cache-')
+        caches = copy.deepcopy(settings.CACHES)
+        caches['default']['LOCATION'] = self._cache_dir
+        self._cache_settings = override_settings(CACHES=caches)
+        self._cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_settings.disable()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+def in_another_process(func, *args):
+    """
+    Call func(*args) in a forked worker process and return its result: what
+    another worker of the site would see or do. The fork inherits the test
+    settings; func must not touch the database (the test transaction and
+    in-memory database are not shared).
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        return pool.submit(func, *args).result()
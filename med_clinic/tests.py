@@ -0,0 +1,558 @@
+import tempfile
+import threading
+from datetime import time, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template import engines
+from django.urls import URLPattern, reverse
+from django.utils.timezone import now
+
+from finance import urls as finance_urls
+from finance.receipts import render_receipts
+from med_clinic import audit
+from med_clinic.aio import gather_reads, apaginate
+from med_clinic.data_versions import INVOICE, bump_data_version, data_version
+from med_clinic.jobs import task, enqueue, claim, run_job
+from med_clinic.middleware import AuditMiddleware
+from med_clinic.models import AuditEntry, Job
+from med_clinic.test_runner import in_another_process
+from finance.models import Appointment, AppointmentService, Invoice, Receipt
+from service import urls as service_urls
+from service.catalog import invalidate_catalog
+from service.models import Service
+from users import urls as users_urls
+from users.models import User, DoctorProfile, PatientProfile, DoctorWorkingHours
+
+
+def _url_names(module):
+    return {p.name for p in module.urlpatterns if isinstance(p, URLPattern) and p.name}
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query budget for every page of users, finance and service.
+
+    Each URL is requested once, then the data set is grown and the URL is
+    requested again: the number of queries must stay within the budget and
+    must not grow with the number of rows. The client logs in afresh before
+    every request, so the user is read from the database once; the session
+    and page fragments come from the cache.
+    """
+
+    # url name -> (role or None for anonymous, budget)
+    BUDGETS = {
+        'register_manager': (None, 0),
+        'login': (None, 0),
+        'logout': (User.ROLE_PATIENT, 3),
+        'add_doctor': (User.ROLE_MANAGER, 1),
+        'manager_dashboard': (User.ROLE_MANAGER, 2),
+        'patient_search': (User.ROLE_MANAGER, 2),
+        'doctor_dashboard': (User.ROLE_DOCTOR, 2),
+        'doctor_worklist_changes': (User.ROLE_DOCTOR, 3),
+        'patient_dashboard': (User.ROLE_PATIENT, 4),
+        'home_dashboard': (User.ROLE_MANAGER, 1),
+        'cashier_dashboard': (User.ROLE_CASHIER, 2),
+        'approve_payment': (User.ROLE_CASHIER, 8),
+        'approve_payments': (User.ROLE_CASHIER, 10),
+        'confirm_invoice_payment': (User.ROLE_CASHIER, 8),
+        'invoice_receipt': (User.ROLE_CASHIER, 2),
+        'receipt_file': (User.ROLE_CASHIER, 2),
+        'appointment_create': (User.ROLE_MANAGER, 2),
+        'invoice_list': (User.ROLE_MANAGER, 2),
+        'doctor_availability': (User.ROLE_MANAGER, 4),
+        'revenue_report': (User.ROLE_MANAGER, 2),
+        'revenue_rebuild': (User.ROLE_MANAGER, 4),
+        'export_invoices': (User.ROLE_MANAGER, 1),
+        'export_appointments': (User.ROLE_MANAGER, 1),
+        'service_list': (User.ROLE_MANAGER, 1),
+        'service_create': (User.ROLE_MANAGER, 3),
+        'service_update': (User.ROLE_MANAGER, 5),
+        'service_delete': (User.ROLE_MANAGER, 2),
+        'catalog_services': (User.ROLE_MANAGER, 1),
+        'catalog_doctors': (User.ROLE_MANAGER, 1),
+    }
+
+    # state-changing URLs are POSTed, everything else is a GET
+    POST_URLS = {'approve_payment', 'approve_payments', 'confirm_invoice_payment', 'revenue_rebuild'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            role: User.objects.create_user(username=role, password='pass', role=role)
+            for role, _ in User.ROLE_CHOICES
+        }
+        cls.doctor = DoctorProfile.objects.create(user=cls.users[User.ROLE_DOCTOR])
+        cls.patient = PatientProfile.objects.create(user=cls.users[User.ROLE_PATIENT])
+        DoctorWorkingHours.objects.create(doctor=cls.doctor, weekday=0, start_time=time(9), end_time=time(18))
+        cls.service = Service.objects.create(name='Консультация', price=Decimal('100.00'))
+        cls.service.doctors.add(cls.doctor)
+        cls._grow(5)
+        cls.invoice = Invoice.objects.first()
+
+    @classmethod
+    def _grow(cls, count):
+        for i in range(count):
+            user = User.objects.create(username=f'p{User.objects.count()}', role=User.ROLE_PATIENT)
+            patient = PatientProfile.objects.create(user=user)
+            appt = Appointment.objects.create(patient=patient)
+            for _ in range(2):
+                AppointmentService.objects.create(
+                    appointment=appt, service=cls.service, doctor=cls.doctor, price=cls.service.price
+                )
+            Invoice.objects.create(appointment=appt, status=Invoice.STATUS_UNPAID)
+            Service.objects.create(name=f'Услуга {i}', price=Decimal('10.00')).doctors.add(cls.doctor)
+
+    def setUp(self):
+        invalidate_catalog()
+        cache.clear()
+        self.enterContext(override_settings(RECEIPTS_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def _receipt(self):
+        Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.users[User.ROLE_CASHIER])
+        render_receipts(Invoice.objects.filter(pk=self.invoice.pk), force=True)
+        return Receipt.objects.get(invoice=self.invoice, format=Receipt.FORMAT_HTML)
+
+    def _request(self, name):
+        if name == 'receipt_file':
+            return reverse(name, args=[self._receipt().digest, Receipt.FORMAT_HTML]), {}
+        if name == 'invoice_receipt':
+            self._receipt()
+        args = {
+            'appointment_create': [self.patient.user_id],
+            'approve_payment': [self.invoice.id],
+            'confirm_invoice_payment': [self.invoice.id],
+            'invoice_receipt': [self.invoice.id],
+            'doctor_availability': [self.doctor.id],
+            'service_update': [self.service.id],
+            'service_delete': [self.service.id],
+        }.get(name, [])
+        params = {
+            'patient_search': {'q': 'p1'},
+            'doctor_worklist_changes': {'since': '2025-09-01T00:00:00'},
+            'doctor_availability': {'date': '2025-09-01'},
+            'approve_payments': {'invoice_ids': list(Invoice.objects.values_list('id', flat=True))},
+        }.get(name, {})
+        return reverse(name, args=args), params
+
+    def _count(self, name, role):
+        self.client.logout()
+        if role:
+            self.client.force_login(self.users[role])
+        url, params = self._request(name)
+        if name in self.POST_URLS:
+            # every payment request starts from unpaid invoices
+            Invoice.objects.update(status=Invoice.STATUS_UNPAID, paid_at=None, confirmed_by=None)
+        method = self.client.post if name in self.POST_URLS else self.client.get
+        with CaptureQueriesContext(connection) as ctx:
+            response = method(url, params)
+        self.assertLess(response.status_code, 400, name)
+        return len(ctx.captured_queries)
+
+    def test_every_url_has_a_budget(self):
+        names = _url_names(users_urls) | _url_names(finance_urls) | _url_names(service_urls)
+        self.assertEqual(names - set(self.BUDGETS), set())
+
+    def test_query_budgets(self):
+        first = {}
+        for name, (role, budget) in self.BUDGETS.items():
+            # каталог услуг кэшируется — сравниваем прогретые запросы
+            self._count(name, role)
+            first[name] = self._count(name, role)
+            self.assertLessEqual(first[name], budget, name)
+
+        self._grow(10)
+        invalidate_catalog()
+        for name, (role, budget) in self.BUDGETS.items():
+            self._count(name, role)
+            self.assertEqual(self._count(name, role), first[name], f'{name} grows with the data')
+
+
+class SQLBudgetMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+        cls.doctor = User.objects.create_user(username='doctor', password='pass', role=User.ROLE_DOCTOR)
+        DoctorProfile.objects.create(user=cls.doctor)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    @override_settings(SQL_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('service_list'))
+
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ queries, 0 duplicates", app;dur=')
+
+    def test_logs_one_line_per_request(self):
+        with self.assertLogs('med_clinic.sql', level='INFO') as logs:
+            self.client.get(reverse('service_list'))
+
+        stats = logs.records[-1].sql_stats
+        self.assertEqual(stats['view'], 'service_list')
+        self.assertEqual(stats['duplicates'], 0)
+        self.assertGreater(stats['queries'], 0)
+
+    @override_settings(SQL_QUERY_BUDGET=0)
+    def test_over_budget_is_a_warning(self):
+        with self.assertLogs('med_clinic.sql', level='WARNING'):
+            self.client.get(reverse('service_list'))
+
+    def test_counts_the_queries_of_an_async_view(self):
+        self.client.force_login(self.doctor)
+        with self.assertLogs('med_clinic.sql', level='INFO') as logs:
+            self.client.get(reverse('doctor_dashboard'))
+        wsgi = logs.records[-1].sql_stats
+
+        async_to_sync(self.async_client.aforce_login)(self.doctor)
+        with self.assertLogs('med_clinic.sql', level='INFO') as logs:
+            async_to_sync(self.async_client.get)(reverse('doctor_dashboard'))
+        asgi = logs.records[-1].sql_stats
+
+        self.assertEqual(asgi['view'], 'doctor_dashboard')
+        self.assertGreater(asgi['queries'], 0)
+        self.assertEqual(asgi['queries'], wsgi['queries'])
+
+
+class SQLiteProfileTests(TestCase):
+    def _pragmas(self, *names):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=str(Path(tmpdir) / 'db.sqlite3')), 'pragmas')
+            try:
+                with wrapper.cursor() as cursor:
+                    return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+            finally:
+                wrapper.close()
+
+    def test_new_connection_is_tuned(self):
+        pragmas = self._pragmas('journal_mode', 'synchronous', 'busy_timeout', 'cache_size')
+
+        # synchronous=NORMAL is reported as 1
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -20000})
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL; DROP TABLE users_user'})
+    def test_rejects_malformed_pragma(self):
+        with self.assertRaises(ValueError):
+            self._pragmas('journal_mode')
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+        cls.cashier = User.objects.create_user(username='cashier', password='pass', role=User.ROLE_CASHIER)
+        cls.service = Service.objects.create(name='Консультация', price=Decimal('100.00'))
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user(username='patient', password='pass', role=User.ROLE_PATIENT)
+        )
+        appt = Appointment.objects.create(patient=patient)
+        AppointmentService.objects.create(appointment=appt, service=cls.service, price=cls.service.price)
+        cls.invoice = Invoice.objects.create(appointment=appt, total_amount=cls.service.price)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_view_skips_the_rows(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('service_list'))
+
+        # the service query is inside the cached fragment,
+        # the session and the user are cached as well
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('service_list'))
+        self.assertContains(response, 'Консультация')
+
+    def test_save_bumps_the_version(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('service_list'))
+
+        self.service.price = Decimal('150.00')
+        self.service.save()
+
+        self.assertContains(self.client.get(reverse('service_list')), '150.00')
+
+    def test_payment_refreshes_invoice_rows(self):
+        self.client.force_login(self.cashier)
+        url = reverse('invoice_list')
+        self.assertContains(self.client.get(url), 'confirm-payment-form')
+
+        Invoice.objects.filter(pk=self.invoice.pk).mark_paid(self.cashier)
+
+        self.assertNotContains(self.client.get(url), reverse('confirm_invoice_payment', args=[self.invoice.pk]))
+
+    def test_write_in_another_worker_refreshes_invoice_rows(self):
+        self.client.force_login(self.cashier)
+        url = reverse('invoice_list')
+        self.client.get(url)
+        Invoice.objects.filter(pk=self.invoice.pk).update(status=Invoice.STATUS_PAID)
+        version = data_version(INVOICE)
+
+        # the worker that made the write bumps the version in the shared cache
+        in_another_process(bump_data_version, INVOICE)
+
+        self.assertNotEqual(data_version(INVOICE), version)
+        self.assertNotContains(self.client.get(url), reverse('confirm_invoice_payment', args=[self.invoice.pk]))
+
+    def test_line_item_change_refreshes_invoice_rows(self):
+        url = reverse('invoice_list')
+        self.client.get(url)
+
+        AppointmentService.objects.create(
+            appointment=self.invoice.appointment, service=self.service, price=Decimal('7.00')
+        )
+
+        self.assertContains(self.client.get(url), '107.00')
+
+    def test_templates_are_compiled_once(self):
+        loaders = engines['django'].engine.template_loaders
+
+        self.assertEqual([type(loader).__name__ for loader in loaders], ['Loader'])
+        self.assertEqual(type(loaders[0]).__module__, 'django.template.loaders.cached')
+
+
+CALLS = []
+
+
+@task('tests.record')
+def record(value):
+    CALLS.append(value)
+
+
+@task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def _run_once(self):
+        call_command('run_jobs', once=True, workers=1, stdout=StringIO())
+
+    def test_worker_runs_queued_jobs(self):
+        record.enqueue(value=1)
+        enqueue('tests.record', {'value': 2})
+
+        self._run_once()
+
+        self.assertEqual(CALLS, [1, 2])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.STATUS_DONE})
+
+    def test_delayed_job_waits(self):
+        record.enqueue(delay=timedelta(minutes=5), value=1)
+
+        self._run_once()
+
+        self.assertEqual(CALLS, [])
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        job = fail.enqueue()
+
+        with self.assertLogs('med_clinic.jobs', 'WARNING') as logs:
+            self._run_once()
+        self.assertIn('failed (attempt 1 of 2)', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+        self.assertGreater(job.run_at, now())
+
+        Job.objects.filter(pk=job.pk).update(run_at=now())
+        with self.assertLogs('med_clinic.jobs', 'WARNING') as logs:
+            self._run_once()
+        self.assertIn('failed (attempt 2 of 2)', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+    def test_claimed_job_is_hidden_until_visibility_timeout(self):
+        job = record.enqueue(value=1)
+
+        self.assertEqual(claim('a', 10), [job])
+        self.assertEqual(claim('b', 10), [])
+
+        Job.objects.filter(pk=job.pk).update(locked_until=now() - timedelta(seconds=1))
+        reclaimed = claim('b', 10)
+        self.assertEqual(reclaimed, [job])
+        # the first worker lost the job and cannot finish it
+        run_job(Job.objects.get(pk=job.pk), 'a')
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_RUNNING)
+
+    def test_unique_enqueue(self):
+        self.assertIsNotNone(record.enqueue(unique=True, value=1))
+        self.assertIsNone(record.enqueue(unique=True, value=1))
+        self.assertIsNotNone(record.enqueue(unique=True, value=2))
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+
+class AsyncReadsTests(TransactionTestCase):
+    """gather_reads() overlaps reads on separate connections outside a transaction."""
+
+    def test_reads_run_concurrently(self):
+        User.objects.create(username='a', role=User.ROLE_PATIENT)
+        # both reads must be running at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def read():
+            barrier.wait()
+            return User.objects.count(), id(connections['default'])
+
+        (count_a, conn_a), (count_b, conn_b) = async_to_sync(gather_reads)(read, read)
+
+        self.assertEqual((count_a, count_b), (1, 1))
+        self.assertNotEqual(conn_a, conn_b)
+
+
+class AsyncPaginationTests(TestCase):
+    """apaginate() inside a transaction: the uncommitted rows must be visible."""
+
+    def test_reads_stay_on_the_transaction_connection(self):
+        for i in range(5):
+            User.objects.create(username=f'u{i}', role=User.ROLE_PATIENT)
+        users = User.objects.order_by('id')
+
+        page = async_to_sync(apaginate)(users, 2, '2')
+        self.assertEqual([user.username for user in page], ['u2', 'u3'])
+        self.assertEqual(page.paginator.num_pages, 3)
+
+        # past the end and garbage both fall back like Paginator.get_page()
+        self.assertEqual(async_to_sync(apaginate)(users, 2, '9').number, 3)
+        self.assertEqual(async_to_sync(apaginate)(users, 2, 'x').number, 1)
+
+
+class AuditTests(TestCase):
+    """Audit entries are buffered on commit and written after the response."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+        cls.cashier = User.objects.create_user(username='cashier', password='pass', role=User.ROLE_CASHIER)
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(username='doctor', password='pass', role=User.ROLE_DOCTOR)
+        )
+        cls.service = Service.objects.create(name='Консультация', price=Decimal('100.00'))
+        cls.service.doctors.add(cls.doctor)
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user(username='patient', password='pass', role=User.ROLE_PATIENT)
+        )
+        appt = Appointment.objects.create(patient=patient)
+        cls.invoice = Invoice.objects.create(appointment=appt, total_amount=cls.service.price)
+
+    def setUp(self):
+        audit.flush()
+
+    def _entries(self, model):
+        return list(AuditEntry.objects.filter(model=model._meta.label_lower).order_by('id'))
+
+    def test_payment_is_written_after_its_transaction(self):
+        self.client.force_login(self.cashier)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('confirm_invoice_payment', args=[self.invoice.pk]))
+        self.assertFalse([q for q in queries if 'med_clinic_auditentry' in q['sql']])
+
+        self.assertEqual(audit.flush(), 1)
+        [entry] = self._entries(Invoice)
+        self.assertEqual((entry.object_id, entry.action), (self.invoice.pk, AuditEntry.ACTION_UPDATE))
+        self.assertEqual((entry.actor_id, entry.actor_name), (self.cashier.pk, 'cashier'))
+        self.assertEqual(entry.changes['status'], [Invoice.STATUS_UNPAID, Invoice.STATUS_PAID])
+
+    def test_request_user_is_the_actor_of_a_diff(self):
+        self.client.force_login(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('service_update', args=[self.service.pk]), {
+                'name': 'Консультация', 'description': '', 'price': '150.00', 'duration_minutes': 30,
+                'doctors': [self.doctor.pk],
+            })
+        audit.flush()
+
+        [entry] = self._entries(Service)
+        self.assertEqual(entry.actor_name, 'manager')
+        # only the changed field
+        self.assertEqual(entry.changes, {'price': ['100.00', '150.00']})
+
+    def test_recalculated_invoice_total_is_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with audit.acting_as(self.manager):
+                AppointmentService.objects.create(
+                    appointment=self.invoice.appointment, service=self.service, price=Decimal('150.00'),
+                )
+        audit.flush()
+
+        [entry] = self._entries(Invoice)
+        self.assertEqual((entry.object_id, entry.actor_name), (self.invoice.pk, 'manager'))
+        self.assertEqual(entry.changes, {'total_amount': ['100.00', '150.00']})
+
+    def test_rolled_back_change_leaves_no_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Service.objects.create(name='Рентген', price=Decimal('300.00'))
+                raise RuntimeError
+        audit.flush()
+
+        self.assertEqual(self._entries(Service), [])
+
+    def test_create_and_delete_without_a_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(name='Рентген', price=Decimal('300.00'))
+            service_id = service.pk
+            service.delete()
+        audit.flush()
+
+        created, deleted = self._entries(Service)
+        self.assertEqual((created.object_id, created.action), (service_id, AuditEntry.ACTION_CREATE))
+        self.assertEqual(created.changes['name'], [None, 'Рентген'])
+        self.assertEqual((deleted.object_id, deleted.action), (service_id, AuditEntry.ACTION_DELETE))
+        self.assertIsNone(deleted.actor_id)
+
+    def test_entries_of_a_temporary_database(self):
+        alias = 'audit_tmp'
+        connections.settings[alias] = dict(connections['default'].settings_dict)
+        try:
+            audit.record(Service, [1, 2], AuditEntry.ACTION_UPDATE, using=alias)
+            self.assertEqual(audit.discard(alias), 2)
+
+            audit.record(Service, [3], AuditEntry.ACTION_UPDATE, using=alias)
+        finally:
+            del connections.settings[alias]
+        # not discarded by its owner: dropped with a warning, never written elsewhere
+        with self.assertLogs('med_clinic.audit', 'WARNING') as logs:
+            self.assertEqual(audit.flush(), 0)
+        self.assertIn("dropped 1 audit entries of the removed database 'audit_tmp'", logs.output[0])
+
+    def test_request_user_is_the_actor_under_asgi(self):
+        async def view(request):
+            await sync_to_async(audit.record)(Service, self.service.pk, AuditEntry.ACTION_UPDATE)
+            return HttpResponse()
+
+        middleware = AuditMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/')
+        request.user = self.manager
+        with self.captureOnCommitCallbacks(execute=True):
+            async_to_sync(middleware)(request)
+        audit.flush()
+
+        [entry] = self._entries(Service)
+        self.assertEqual(entry.actor_name, 'manager')
+
+    @override_settings(AUDIT_BATCH_SIZE=2)
+    def test_full_buffer_is_written_at_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name='Рентген', price=Decimal('300.00'))
+        self.assertEqual(self._entries(Service), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name='УЗИ', price=Decimal('200.00'))
+        self.assertEqual(len(self._entries(Service)), 2)
@@ -2,4 +2,11 @@ from django.contrib import admin
 from .models import *
 # Register your models here.
 
-admin.site.register(Service)
\ No newline at end of file
+admin.site.register(Service)
+
+
+@admin.register(ServicePrice)
+class ServicePriceAdmin(admin.ModelAdmin):
+    list_display = ("service", "price", "valid_from", "created_at")
+    list_filter = ("service",)
+    date_hierarchy = "valid_from"
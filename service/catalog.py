@@ -0,0 +1,138 @@
+"""
+Кэш каталога услуг в памяти процесса.
+
+Каталог (услуги, цены и какие врачи оказывают какую услугу) меняется редко,
+а читается при каждом создании приёма. Снимок строится один раз и живёт в
+памяти процесса, пока не сменится версия каталога. Версия хранится в
+общем для всех процессов кэше (settings.CACHES), поэтому изменение услуги в
+одном процессе сбрасывает снимки во всех остальных.
+
+Версия начинается с времени изменения каталога, поэтому по ней же отвечают
+на условные GET: она служит ETag, а её время — Last-Modified.
+
+В снимок входит и история цен каждой услуги (service.prices): цена на любой
+момент ищется в ней бинарным поиском, без запросов к базе.
+"""
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from users.models import display_name
+from .models import Service, ServicePrice
+
+CATALOG_VERSION_KEY = "service:catalog:version"
+
+
+class CatalogService:
+    """Услуга в снимке каталога."""
+
+    __slots__ = ("id", "name", "description", "price", "duration_minutes", "doctor_ids", "price_starts", "prices")
+
+    def __init__(self, id, name, description, price, duration_minutes, doctor_ids, price_history=()):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.price = price
+        self.duration_minutes = duration_minutes
+        self.doctor_ids = doctor_ids
+        # история цен: начала действия по возрастанию и цены с этих моментов
+        self.price_starts = tuple(valid_from for valid_from, _ in price_history)
+        self.prices = tuple(price for _, price in price_history)
+
+    def price_at(self, when):
+        """Цена, действующая в момент when (до первой записи истории — первая цена)"""
+        if not self.prices:
+            return self.price
+        return self.prices[max(bisect_right(self.price_starts, when) - 1, 0)]
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога для одной версии."""
+
+    def __init__(self, version, services, doctor_names):
+        self.version = version
+        # id услуги -> CatalogService, в порядке Service.Meta.ordering
+        self.services = services
+        # id врача -> отображаемое имя
+        self.doctor_names = doctor_names
+        self.eligible = {
+            (service.id, doctor_id)
+            for service in services.values()
+            for doctor_id in service.doctor_ids
+        }
+
+    def is_eligible(self, service_id, doctor_id):
+        """Оказывает ли врач эту услугу"""
+        return (service_id, doctor_id) in self.eligible
+
+    def price_at(self, service_id, when):
+        """Цена услуги в момент when (None — услуги нет в каталоге)"""
+        service = self.services.get(service_id)
+        return service.price_at(when) if service else None
+
+
+_snapshot = None
+
+
+def _new_version():
+    return f"{int(time.time())}-{uuid4().hex}"
+
+
+def catalog_version():
+    """Текущая версия каталога (создаётся при первом обращении)"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def invalidate_catalog():
+    """Сменить версию каталога — все процессы перестроят снимок при следующем чтении"""
+    global _snapshot
+    cache.set(CATALOG_VERSION_KEY, _new_version(), None)
+    _snapshot = None
+
+
+def catalog_changed_at(version=None):
+    """Время изменения каталога по его версии (UTC, с точностью до секунды)"""
+    changed, _, _ = (version or catalog_version()).partition("-")
+    return datetime.fromtimestamp(int(changed), tz=timezone.utc) if changed.isdigit() else None
+
+
+def _build_snapshot(version):
+    services = {}
+    doctor_names = {}
+    history = {}
+    for service_id, valid_from, price in (
+        ServicePrice.objects.order_by("service_id", "valid_from").values_list("service_id", "valid_from", "price")
+    ):
+        history.setdefault(service_id, []).append((valid_from, price))
+    for service in Service.objects.prefetch_related("doctors__user"):
+        doctors = list(service.doctors.all())
+        for doctor in doctors:
+            doctor_names[doctor.id] = display_name(doctor.user)
+        services[service.id] = CatalogService(
+            id=service.id,
+            name=service.name,
+            description=service.description,
+            price=service.price,
+            duration_minutes=service.duration_minutes,
+            doctor_ids=frozenset(doctor.id for doctor in doctors),
+            price_history=history.get(service.id, ()),
+        )
+    return CatalogSnapshot(version, services, doctor_names)
+
+
+def get_catalog():
+    """Снимок каталога услуг; в БД идём только если версия сменилась"""
+    global _snapshot
+    version = catalog_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = _snapshot = _build_snapshot(version)
+    return snapshot
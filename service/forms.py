@@ -1,5 +1,6 @@
 from django import forms
-from .models import Service
+from django.utils.timezone import now
+from .models import Service, ServicePrice
 from users.models import DoctorProfile
 
 
@@ -8,9 +9,21 @@ class ServiceForm(forms.ModelForm):
     Форма для создания и редактирования услуг.
     """
 
+    price_valid_from = forms.DateTimeField(
+        required=False,
+        label="Цена действует с",
+        help_text="Пусто — с текущего момента. Дата в будущем запланирует смену цены.",
+        input_formats=["%Y-%m-%dT%H:%M"],
+        widget=forms.DateTimeInput(format="%Y-%m-%dT%H:%M", attrs={
+            'type': 'datetime-local',
+            'class': 'form-input mt-1 block w-full rounded-md border-gray-300 shadow-sm '
+                     'focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
+        }),
+    )
+
     class Meta:
         model = Service
-        fields = ['name', 'description', 'price', 'doctors']
+        fields = ['name', 'description', 'price', 'duration_minutes', 'doctors']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-input mt-1 block w-full rounded-md border-gray-300 shadow-sm '
@@ -24,8 +37,33 @@ class ServiceForm(forms.ModelForm):
                 'class': 'form-input mt-1 block w-full rounded-md border-gray-300 shadow-sm '
                          'focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
             }),
+            'duration_minutes': forms.NumberInput(attrs={
+                'class': 'form-input mt-1 block w-full rounded-md border-gray-300 shadow-sm '
+                         'focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
+            }),
             'doctors': forms.SelectMultiple(attrs={
                 'class': 'form-multiselect mt-1 block w-full rounded-md border-gray-300 shadow-sm '
                          'focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
             }),
                     }
+
+    def clean_price_valid_from(self):
+        valid_from = self.cleaned_data.get("price_valid_from")
+        if valid_from and not self.instance.pk and valid_from > now():
+            # у новой услуги нет прежней цены, которая действовала бы до этой даты
+            raise forms.ValidationError(
+                "Новая услуга получает цену сразу. Смену цены можно запланировать после создания услуги."
+            )
+        return valid_from
+
+    def save(self, commit=True):
+        """Цена с датой начала действия записывается в историю цен (service.prices)"""
+        valid_from = self.cleaned_data.get("price_valid_from")
+        price = self.cleaned_data["price"]
+        if valid_from and self.instance.pk:
+            # текущую цену сменит сама история — если новая цена уже действует
+            self.instance.price = self.initial["price"]
+        service = super().save(commit)
+        if commit and valid_from:
+            ServicePrice.objects.update_or_create(service=service, valid_from=valid_from, defaults={"price": price})
+        return service
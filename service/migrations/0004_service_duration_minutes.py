@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0003_remove_service_rooms_delete_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=30, verbose_name='Длительность, мин'),
+        ),
+    ]
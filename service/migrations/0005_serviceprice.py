@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def record_current_prices(apps, schema_editor):
+    # история начинается с текущих цен; до первой записи действует первая цена
+    Service = apps.get_model('service', 'Service')
+    ServicePrice = apps.get_model('service', 'ServicePrice')
+    started = timezone.now()
+    ServicePrice.objects.bulk_create(
+        ServicePrice(service_id=service_id, price=price, valid_from=started)
+        for service_id, price in Service.objects.values_list('id', 'price')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0004_service_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServicePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Стоимость')),
+                ('valid_from', models.DateTimeField(verbose_name='Действует с')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='service.service', verbose_name='Услуга')),
+            ],
+            options={
+                'verbose_name': 'Цена услуги',
+                'verbose_name_plural': 'История цен услуг',
+                'ordering': ['service', 'valid_from'],
+                'constraints': [models.UniqueConstraint(fields=('service', 'valid_from'), name='unique_service_price_start')],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
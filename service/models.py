@@ -8,6 +8,7 @@ class Service(models.Model):
     name = models.CharField(max_length=200, verbose_name="Название услуги")
     description = models.TextField(blank=True, verbose_name="Описание")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Стоимость")
+    duration_minutes = models.PositiveIntegerField(default=30, verbose_name="Длительность, мин")
     doctors = models.ManyToManyField("users.DoctorProfile", related_name="services", verbose_name="Врачи")
 
     def __str__(self):
@@ -17,3 +18,25 @@ class Service(models.Model):
         verbose_name = "Услуга"
         verbose_name_plural = "Услуги"
         ordering = ['name']
+
+
+class ServicePrice(models.Model):
+    """
+    Цена услуги, действующая с valid_from до valid_from следующей записи той же
+    услуги. Записи с valid_from в будущем — запланированные изменения цены.
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="prices", verbose_name="Услуга")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Стоимость")
+    valid_from = models.DateTimeField(verbose_name="Действует с")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.service}: {self.price} с {self.valid_from:%d.%m.%Y %H:%M}"
+
+    class Meta:
+        verbose_name = "Цена услуги"
+        verbose_name_plural = "История цен услуг"
+        ordering = ["service", "valid_from"]
+        constraints = [
+            models.UniqueConstraint(fields=["service", "valid_from"], name="unique_service_price_start"),
+        ]
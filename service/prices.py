@@ -0,0 +1,60 @@
+"""
+История цен услуг (ServicePrice).
+
+Каждая запись — цена, действующая с valid_from до начала следующей записи той
+же услуги; до первой записи действует первая цена. Service.price — текущая
+цена: её показывают формы и списки, и она всегда равна цене истории на
+сейчас.
+
+- Изменение Service.price (форма, админка) добавляет в историю запись с
+  текущего момента.
+- Запись с valid_from в прошлом сразу становится текущей ценой, если после неё
+  нет более поздних.
+- Запись с valid_from в будущем — запланированная цена: в этот момент задача
+  из очереди переносит её в Service.price.
+
+Цену на произвольный момент (запись на приём, отчёты задним числом) ищут в
+снимке каталога бинарным поиском — без запросов к базе (service.catalog).
+"""
+from django.utils.timezone import now
+
+from med_clinic.jobs import enqueue
+from .models import Service, ServicePrice
+
+APPLY_PRICE = "service.apply_price"
+
+
+def effective_price(service_id, when=None):
+    """Цена услуги из истории на момент when (по умолчанию — сейчас) или None, если истории нет"""
+    prices = ServicePrice.objects.filter(service_id=service_id).order_by("valid_from")
+    price = prices.filter(valid_from__lte=when or now()).values_list("price", flat=True).last()
+    if price is None:
+        price = prices.values_list("price", flat=True).first()
+    return price
+
+
+def record_price(service):
+    """Service.price изменили в обход истории — записать новую цену с текущего момента"""
+    if effective_price(service.id) != service.price:
+        ServicePrice.objects.create(service=service, price=service.price, valid_from=now())
+
+
+def apply_price(service_id):
+    """Перенести в Service.price цену, действующую сейчас"""
+    service = Service.objects.filter(id=service_id).first()
+    if service is None:
+        return
+    price = effective_price(service_id)
+    if price is not None and price != service.price:
+        service.price = price
+        service.save(update_fields=["price"])
+
+
+def price_saved(price):
+    """Запись истории сохранена: текущая цена меняется сразу, будущая — задачей в нужный момент"""
+    delay = price.valid_from - now()
+    if delay.total_seconds() > 0:
+        # задача в той же транзакции: откат отменит и цену, и её применение
+        enqueue(APPLY_PRICE, {"service_id": price.service_id}, delay=delay)
+    else:
+        apply_price(price.service_id)
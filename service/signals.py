@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from med_clinic import audit
+from med_clinic.data_versions import bump_data_version, SERVICE
+from users.models import DoctorProfile
+from .catalog import invalidate_catalog
+from .models import Service, ServicePrice
+from .prices import apply_price, price_saved, record_price
+
+# журнал аудита: создание, изменение перечисленных полей и удаление
+audit.track(Service, ["name", "price", "duration_minutes"])
+
+
+def _invalidate():
+    # сразу — чтобы этот процесс не читал старый снимок внутри транзакции,
+    # и после коммита — чтобы другие процессы не закэшировали незакоммиченное состояние
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
+    bump_data_version(SERVICE)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=DoctorProfile)
+def service_changed(sender, **kwargs):
+    """Услуга изменена или удалена (или удалён врач) — сбрасываем кэш каталога."""
+    _invalidate()
+
+
+@receiver(post_save, sender=Service)
+def service_price_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Цену изменили самой услуге — дописываем её в историю цен."""
+    if not raw and (update_fields is None or "price" in update_fields):
+        record_price(instance)
+
+
+@receiver(post_save, sender=ServicePrice)
+def price_history_saved(sender, instance, raw=False, **kwargs):
+    """Новая или исправленная цена в истории."""
+    if not raw:
+        price_saved(instance)
+    _invalidate()
+
+
+@receiver(post_delete, sender=ServicePrice)
+def price_history_deleted(sender, instance, origin=None, **kwargs):
+    """Удалена цена из истории: текущей может стать другая (если удаляют не саму услугу)."""
+    if not isinstance(origin, Service) and getattr(origin, "model", None) is not Service:
+        apply_price(instance.service_id)
+    _invalidate()
+
+
+@receiver(m2m_changed, sender=Service.doctors.through)
+def service_doctors_changed(sender, action, **kwargs):
+    """Изменён состав врачей услуги."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidate()
@@ -0,0 +1,8 @@
+from med_clinic.jobs import task
+from .prices import APPLY_PRICE, apply_price
+
+
+@task(APPLY_PRICE)
+def apply_scheduled_price(service_id):
+    """Запланированная цена вступила в силу (см. service.prices)"""
+    apply_price(service_id)
@@ -1,3 +1,212 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import localtime, now
+
+from med_clinic.models import Job
+from med_clinic.test_runner import in_another_process
+from users.models import User, DoctorProfile
+from .catalog import catalog_version, get_catalog, invalidate_catalog
+from .models import Service, ServicePrice
+from .prices import APPLY_PRICE, apply_price
+
+
+class CatalogCacheTests(TestCase):
+    """Кэш каталога услуг и карта врачей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        doctor_user = User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        cls.doctor = DoctorProfile.objects.create(user=doctor_user)
+        cls.service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+
+    def setUp(self):
+        # откат транзакции теста не сбрасывает кэш
+        invalidate_catalog()
+
+    def test_warm_catalog_needs_no_queries(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_catalog()
+        self.assertEqual(catalog.services[self.service.id].price, Decimal("50.00"))
+
+    def test_price_change_invalidates(self):
+        get_catalog()
+        self.service.price = Decimal("75.00")
+        self.service.save()
+
+        self.assertEqual(get_catalog().services[self.service.id].price, Decimal("75.00"))
+
+    def test_change_in_another_worker_invalidates(self):
+        version = get_catalog().version
+
+        in_another_process(invalidate_catalog)
+
+        self.assertNotEqual(get_catalog().version, version)
+
+    def test_doctor_assignment_invalidates(self):
+        self.assertFalse(get_catalog().is_eligible(self.service.id, self.doctor.id))
+
+        self.service.doctors.add(self.doctor)
+        self.assertTrue(get_catalog().is_eligible(self.service.id, self.doctor.id))
+
+        self.service.doctors.remove(self.doctor)
+        self.assertFalse(get_catalog().is_eligible(self.service.id, self.doctor.id))
+
+    def test_delete_invalidates(self):
+        get_catalog()
+        service_id = self.service.id
+        Service.objects.filter(id=service_id).delete()
+
+        self.assertNotIn(service_id, get_catalog().services)
+
+
+class CatalogApiTests(TestCase):
+    """JSON каталога с условными GET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        doctor_user = User.objects.create_user(
+            username="doctor", password="pass", role=User.ROLE_DOCTOR, first_name="Иван", last_name="Петров"
+        )
+        cls.doctor = DoctorProfile.objects.create(user=doctor_user)
+        cls.service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+        cls.service.doctors.add(cls.doctor)
+
+    def setUp(self):
+        invalidate_catalog()
+        self.client.force_login(self.manager)
+
+    def test_services_and_doctors(self):
+        services = self.client.get(reverse("catalog_services")).json()["services"]
+        doctors = self.client.get(reverse("catalog_doctors")).json()
+
+        self.assertEqual(services, [{"id": self.service.id, "name": "Анализ", "price": "50.00", "duration_minutes": 30}])
+        self.assertEqual(doctors["doctors"], [{"id": self.doctor.id, "name": "Иван Петров"}])
+        self.assertEqual(doctors["service_doctors"], {str(self.service.id): [self.doctor.id]})
+
+    def test_revalidation_without_catalog_queries(self):
+        response = self.client.get(reverse("catalog_services"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        # сессия и пользователь тоже берутся из кэша
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("catalog_services"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_workers_share_validators(self):
+        etag = self.client.get(reverse("catalog_services"))["ETag"]
+
+        # другой процесс отдаёт тот же ETag
+        self.assertIn(in_another_process(catalog_version), etag)
+        # а после изменения каталога в нём этот ETag здесь уже не подходит
+        in_another_process(invalidate_catalog)
+        response = self.client.get(reverse("catalog_services"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_change_invalidates_etag(self):
+        etag = self.client.get(reverse("catalog_services"))["ETag"]
+        self.service.price = Decimal("60.00")
+        self.service.save()
+
+        response = self.client.get(reverse("catalog_services"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["services"][0]["price"], "60.00")
+
+
+class PriceHistoryTests(TestCase):
+    """История цен, запланированные цены и цена на момент из снимка каталога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="pass", role=User.ROLE_MANAGER)
+        cls.doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(username="doctor", password="pass", role=User.ROLE_DOCTOR)
+        )
+        cls.service = Service.objects.create(name="Анализ", price=Decimal("50.00"))
+        cls.service.doctors.add(cls.doctor)
+
+    def setUp(self):
+        invalidate_catalog()
+
+    def _update(self, price, valid_from=""):
+        self.client.force_login(self.manager)
+        return self.client.post(reverse("service_update", args=[self.service.id]), {
+            "name": "Анализ", "description": "", "price": price, "duration_minutes": 30,
+            "doctors": [self.doctor.id], "price_valid_from": valid_from,
+        })
+
+    def test_price_change_keeps_the_old_price(self):
+        before = now()
+        self.service.price = Decimal("75.00")
+        self.service.save()
+
+        self.assertEqual(list(self.service.prices.values_list("price", flat=True)), [Decimal("50.00"), Decimal("75.00")])
+        catalog = get_catalog()
+        self.assertEqual(catalog.price_at(self.service.id, before), Decimal("50.00"))
+        self.assertEqual(catalog.price_at(self.service.id, now()), Decimal("75.00"))
+        # до начала истории действует первая цена
+        self.assertEqual(catalog.price_at(self.service.id, before - timedelta(days=365)), Decimal("50.00"))
+
+    def test_scheduled_price_applies_when_due(self):
+        starts = (now() + timedelta(days=7)).replace(second=0, microsecond=0)
+        self._update("90.00", localtime(starts).strftime("%Y-%m-%dT%H:%M"))
+
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.price, Decimal("50.00"))
+        job = Job.objects.get(name=APPLY_PRICE)
+        self.assertEqual(job.payload, {"service_id": self.service.id})
+        self.assertTrue(starts <= job.run_at < starts + timedelta(seconds=1))
+        catalog = get_catalog()
+        self.assertEqual(catalog.price_at(self.service.id, starts - timedelta(minutes=1)), Decimal("50.00"))
+        self.assertEqual(catalog.price_at(self.service.id, starts), Decimal("90.00"))
+
+        # срок наступил
+        ServicePrice.objects.filter(price=Decimal("90.00")).update(valid_from=now())
+        apply_price(self.service.id)
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.price, Decimal("90.00"))
+        self.assertEqual(self.service.prices.count(), 2)
+
+    def test_new_service_cannot_start_with_a_future_price(self):
+        self.client.force_login(self.manager)
+
+        response = self.client.post(reverse("service_create"), {
+            "name": "УЗИ", "description": "", "price": "500.00", "duration_minutes": 30,
+            "doctors": [self.doctor.id],
+            "price_valid_from": localtime(now() + timedelta(days=7)).strftime("%Y-%m-%dT%H:%M"),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].has_error("price_valid_from"))
+        self.assertFalse(Service.objects.filter(name="УЗИ").exists())
+        self.assertFalse(Job.objects.filter(name=APPLY_PRICE).exists())
+
+    def test_backdated_price_becomes_current(self):
+        self._update("40.00", localtime(now() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M"))
+
+        self.service.refresh_from_db()
+        # она раньше записи о создании услуги, поэтому текущей остаётся прежняя цена
+        self.assertEqual(self.service.price, Decimal("50.00"))
+        self.assertEqual(get_catalog().price_at(self.service.id, now() - timedelta(days=2)), Decimal("40.00"))
+
+    def test_deleting_the_current_price_restores_the_previous(self):
+        self.service.price = Decimal("75.00")
+        self.service.save()
+
+        self.service.prices.get(price=Decimal("75.00")).delete()
+
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.price, Decimal("50.00"))
 
-# Create your tests here.
+    def test_lookup_needs_no_queries(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_catalog()
+            for days in range(100):
+                catalog.price_at(self.service.id, now() - timedelta(days=days))
@@ -4,6 +4,10 @@ from .models import Service
 from .forms import ServiceForm
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .catalog import get_catalog, catalog_version, catalog_changed_at
 
 # Create your views here.
 
@@ -71,3 +75,59 @@ def service_delete(request, service_id):
         messages.success(request, "Услуга успешно удалена.")
         return redirect('service_list')
     return render(request, 'service/service_delete.html', {'service': service})
+
+
+def _catalog_etag(request, *args, **kwargs):
+    return catalog_version()
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    return catalog_changed_at()
+
+
+# браузер хранит ответ, но каждый раз перепроверяет его по ETag:
+# пока каталог не менялся, сервер отвечает 304 без обращения к БД
+catalog_conditional = condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+
+
+@manager_required
+@cache_control(private=True, no_cache=True)
+@catalog_conditional
+def catalog_services(request):
+    """
+    Услуги каталога (JSON для формы записи).
+    """
+    catalog = get_catalog()
+    return JsonResponse({
+        'version': catalog.version,
+        'services': [
+            {
+                'id': service.id,
+                'name': service.name,
+                'price': str(service.price),
+                'duration_minutes': service.duration_minutes,
+            }
+            for service in catalog.services.values()
+        ],
+    })
+
+
+@manager_required
+@cache_control(private=True, no_cache=True)
+@catalog_conditional
+def catalog_doctors(request):
+    """
+    Врачи и какие услуги они оказывают (JSON для формы записи).
+    """
+    catalog = get_catalog()
+    return JsonResponse({
+        'version': catalog.version,
+        'doctors': [
+            {'id': doctor_id, 'name': name}
+            for doctor_id, name in sorted(catalog.doctor_names.items(), key=lambda item: item[1])
+        ],
+        'service_doctors': {
+            service.id: sorted(service.doctor_ids)
+            for service in catalog.services.values()
+        },
+    })
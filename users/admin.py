@@ -5,4 +5,5 @@ from .models import *
 
 admin.site.register(User)
 admin.site.register(DoctorProfile)
+admin.site.register(DoctorWorkingHours)
 admin.site.register(PatientProfile)
\ No newline at end of file
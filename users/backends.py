@@ -0,0 +1,52 @@
+"""
+Authentication backend that keeps the logged-in user in the cache.
+
+AuthenticationMiddleware resolves request.user through the backend's
+get_user() on every request. Together with the cached_db session engine this
+makes role checks (manager_required & co.) and the navbar cost no queries on
+a warm cache. The cached copy is dropped whenever the user is saved or
+deleted (users.signals), which also covers password changes and
+deactivation.
+
+That invalidation reaches other processes only through a shared cache. With a
+per-process cache (LocMem) a deactivated user or a changed role would keep
+working in the other workers until the entry expires, so the backend then
+reads the user from the database like ModelBackend.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _cache_is_shared():
+    return not isinstance(caches['default'], LocMemCache)
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not _cache_is_shared():
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 3600))
+        return user
+
+    async def aget_user(self, user_id):
+        # request.auser() in async views; ModelBackend.aget_user would skip the cache
+        if not _cache_is_shared():
+            return await super().aget_user(user_id)
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 3600))
+        return user
@@ -1,8 +1,7 @@
 from django import forms
 from .models import User, DoctorProfile, PatientProfile
+from .passwords import temp_password
 from django.contrib.auth.forms import AuthenticationForm
-import secrets
-import string
 
 
 # --- Custom Form Widgets ---
@@ -65,13 +64,12 @@ class DoctorRegistrationForm(forms.ModelForm):
 
     def save(self, commit=True):
         # Generate a temporary password
-        alphabet = string.ascii_letters + string.digits
-        temp_password = ''.join(secrets.choice(alphabet) for i in range(12))
+        password = temp_password()
 
         # Create the user and set their role and password
         user = User.objects.create_user(
             username=f"{self.cleaned_data['first_name'].lower()}{self.cleaned_data['last_name'].lower()}",
-            password=temp_password,
+            password=password,
             role=User.ROLE_DOCTOR,  # Corrected: Set the role field
             is_active=True
         )
@@ -83,7 +81,7 @@ class DoctorRegistrationForm(forms.ModelForm):
         # Create a doctor profile for the user
         DoctorProfile.objects.create(user=user, first_name=user.first_name, last_name=user.last_name)
 
-        return user, temp_password
+        return user, password
 
 
 class PatientRegistrationForm(forms.ModelForm):
@@ -112,13 +110,12 @@ class PatientRegistrationForm(forms.ModelForm):
 
     def save(self, commit=True):
         # Generate a temporary password
-        alphabet = string.ascii_letters + string.digits
-        temp_password = ''.join(secrets.choice(alphabet) for _ in range(12))
+        password = temp_password()
 
         # Create the user
         user = User.objects.create_user(
             username=f"{self.cleaned_data['first_name'].lower()}{self.cleaned_data['last_name'].lower()}",
-            password=temp_password,
+            password=password,
             role=User.ROLE_PATIENT,
             is_active=True
         )
@@ -131,4 +128,4 @@ class PatientRegistrationForm(forms.ModelForm):
         # Create an empty PatientProfile (without first_name/last_name, they now live in User)
         PatientProfile.objects.create(user=user)
 
-        return user, temp_password
+        return user, password
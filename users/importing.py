@@ -0,0 +1,143 @@
+"""
+Bulk import of patients from CSV or JSON (manage.py import_patients).
+
+Every row is validated with PatientRegistrationForm, so the rules are the
+same as on the manager dashboard, but nothing is saved row by row:
+
+* usernames are derived like the form does (first name + last name) and
+  collisions with existing users and within the file are resolved with two
+  queries, by appending 2, 3, ...;
+* users and profiles are inserted with bulk_create and indexed for search
+  with one executemany;
+* passwords are either left unusable (the default: the manager sets one when
+  the patient first comes in) or generated and hashed in a process pool.
+
+Invalid rows are reported with their row number and skipped; they do not
+abort the rest of the import.
+"""
+import csv
+import json
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+
+from .forms import PatientRegistrationForm
+from .models import User, PatientProfile
+from .passwords import temp_password, hash_passwords
+from .search import index_new_patients
+
+FIELDS = ('first_name', 'last_name', 'phone', 'birthday')
+PASSWORDS_UNUSABLE = 'unusable'
+PASSWORDS_GENERATE = 'generate'
+
+_USERNAME_MAX_LENGTH = User._meta.get_field('username').max_length
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = []
+        # (row number, message)
+        self.errors = []
+        # username -> plain temporary password (only with PASSWORDS_GENERATE)
+        self.passwords = {}
+
+
+def read_rows(fileobj, fmt):
+    """Rows of a CSV file with a header line, or of a JSON list of objects."""
+    if fmt == 'json':
+        rows = json.load(fileobj)
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON list of patients.')
+        return rows
+    return list(csv.DictReader(fileobj))
+
+
+def _base_username(data):
+    # what PatientRegistrationForm uses, without the spaces it would keep
+    base = ''.join(f"{data['first_name']}{data['last_name']}".lower().split())
+    # leave room for a numeric suffix
+    return base[:_USERNAME_MAX_LENGTH - 6]
+
+
+def allocate_usernames(bases, chunk_size=500):
+    """Unique usernames for the given bases, in order, with two kinds of bulk queries."""
+    wanted = set(bases)
+    taken = set(User.objects.filter(username__in=wanted).values_list('username', flat=True))
+
+    seen = set()
+    colliding = set()
+    for base in bases:
+        if base in taken or base in seen:
+            colliding.add(base)
+        seen.add(base)
+
+    # existing "base2", "base3", ... for the bases that need a suffix
+    colliding = sorted(colliding)
+    for start in range(0, len(colliding), chunk_size):
+        condition = reduce(or_, (Q(username__startswith=base) for base in colliding[start:start + chunk_size]))
+        taken.update(User.objects.filter(condition).values_list('username', flat=True))
+
+    usernames = []
+    for base in bases:
+        username, suffix = base, 2
+        while username in taken:
+            username, suffix = f'{base}{suffix}', suffix + 1
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def _validate(rows, result):
+    valid = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            result.errors.append((number, 'not an object'))
+            continue
+        form = PatientRegistrationForm({field: str(row.get(field) or '').strip() for field in FIELDS})
+        if not form.is_valid():
+            message = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+            result.errors.append((number, message))
+        elif not form.cleaned_data['first_name'] or not form.cleaned_data['last_name']:
+            result.errors.append((number, 'first_name and last_name are required'))
+        else:
+            valid.append(form.cleaned_data)
+    return valid
+
+
+def import_patients(rows, passwords=PASSWORDS_UNUSABLE, workers=None, batch_size=1000, dry_run=False):
+    """Validate and create patients in bulk. Returns an ImportResult."""
+    result = ImportResult()
+    valid = _validate(rows, result)
+    if not valid:
+        return result
+
+    usernames = allocate_usernames([_base_username(data) for data in valid])
+    if passwords == PASSWORDS_GENERATE:
+        plain = [temp_password() for _ in valid]
+        hashes = hash_passwords(plain, workers)
+        result.passwords = dict(zip(usernames, plain))
+    else:
+        hashes = [make_password(None) for _ in valid]
+
+    users = [
+        User(
+            username=username,
+            password=password_hash,
+            role=User.ROLE_PATIENT,
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            phone=data['phone'],
+            birthday=data['birthday'],
+        )
+        for username, password_hash, data in zip(usernames, hashes, valid)
+    ]
+    if not dry_run:
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=batch_size)
+            PatientProfile.objects.bulk_create([PatientProfile(user=user) for user in users], batch_size=batch_size)
+            index_new_patients(users)
+    result.created = users
+    return result
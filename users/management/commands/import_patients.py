@@ -0,0 +1,61 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importing import read_rows, import_patients, PASSWORDS_UNUSABLE, PASSWORDS_GENERATE
+
+
+class Command(BaseCommand):
+    help = (
+        "Import patients in bulk from a CSV file (header: first_name,last_name,phone,birthday) "
+        "or a JSON list of objects with the same keys. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension")
+        parser.add_argument(
+            "--passwords", choices=[PASSWORDS_UNUSABLE, PASSWORDS_GENERATE], default=PASSWORDS_UNUSABLE,
+            help="Leave passwords unusable (fast) or generate temporary ones",
+        )
+        parser.add_argument("--passwords-out", help="CSV file for the generated usernames and passwords")
+        parser.add_argument("--workers", type=int, help="Processes for password hashing (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, create nothing")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        fmt = options["format"] or ("json" if path.suffix.lower() == ".json" else "csv")
+        generate = options["passwords"] == PASSWORDS_GENERATE
+        if generate and not options["passwords_out"] and not options["dry_run"]:
+            raise CommandError("--passwords generate needs --passwords-out, otherwise the passwords are lost.")
+
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                rows = read_rows(f, fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        result = import_patients(
+            rows,
+            passwords=options["passwords"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+
+        for number, message in result.errors:
+            self.stderr.write(f"Row {number}: {message}")
+
+        if generate and result.created and not options["dry_run"]:
+            with open(options["passwords_out"], "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["username", "first_name", "last_name", "password"])
+                for user in result.created:
+                    writer.writerow([user.username, user.first_name, user.last_name, result.passwords[user.username]])
+
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(result.created)} patients, skipped {len(result.errors)} invalid rows."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.search import rebuild_index, search_available
+
+
+class Command(BaseCommand):
+    help = "Rebuild the patient search index from the users table."
+
+    def handle(self, *args, **options):
+        if not search_available():
+            self.stdout.write("Full-text search is only used on SQLite; nothing to rebuild.")
+            return
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} patients."))
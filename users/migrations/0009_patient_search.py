@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_patient_search "
+        "USING fts5(first_name, last_name, username, phone, tokenize='trigram')"
+    )
+    User = apps.get_model('users', 'User')
+    rows = [
+        (user.pk, user.first_name, user.last_name, user.username, ''.join(c for c in (user.phone or '') if c.isdigit()))
+        for user in User.objects.filter(role='patient').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users_patient_search (rowid, first_name, last_name, username, phone) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS users_patient_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_doctorworkinghours'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -21,6 +21,12 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, blank=True, null=True)
     birthday = models.DateField(null=True, blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Backs the keyset-paginated patient list on the manager dashboard
+            models.Index(fields=['role', 'date_joined', 'id'], name='user_role_joined_idx'),
+        ]
+
     @property
     def is_manager(self):
         return self.role == self.ROLE_MANAGER
@@ -37,6 +43,12 @@ class User(AbstractUser):
     def is_cashier(self):
         return self.role == self.ROLE_CASHIER
 
+
+def display_name(user):
+    """The name shown for a user: the full name, else the username; '' for no user."""
+    return (user.get_full_name() or user.username) if user else ''
+
+
 class DoctorProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='doctor_profile')
     # New fields for the doctor profile
@@ -50,6 +62,34 @@ class DoctorProfile(models.Model):
     def __str__(self):
         return f"Dr. {self.user.username}"
 
+class DoctorWorkingHours(models.Model):
+    """
+    One working window of a doctor on a weekday, e.g. Monday 09:00-13:00.
+    A doctor may have several windows per day; a doctor without any windows
+    is treated as available at any time.
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.doctor} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
 class PatientProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='patient_profile')
     # New fields for the patient
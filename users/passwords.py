@@ -0,0 +1,31 @@
+"""
+Temporary passwords for new patients and parallel password hashing.
+
+PBKDF2 is slow on purpose (tens of milliseconds per password), so hashing
+thousands of imported passwords one after another takes minutes. The work is
+CPU-bound and independent per password, so it is spread over a process pool.
+"""
+import os
+import secrets
+import string
+
+from django.contrib.auth.hashers import make_password
+
+from med_clinic.processes import process_pool, chunk_size
+
+TEMP_PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+
+def temp_password(length=12):
+    """A random temporary password handed to the patient by the manager."""
+    return ''.join(secrets.choice(TEMP_PASSWORD_ALPHABET) for _ in range(length))
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for every password, in the same order, using a process pool."""
+    passwords = list(passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with process_pool(workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunk_size(len(passwords), workers)))
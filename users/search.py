@@ -0,0 +1,144 @@
+"""
+Patient search over first/last name, username and phone.
+
+On SQLite the data lives in an FTS5 table with the trigram tokenizer, so any
+substring of three or more characters (including part of a phone number) is
+matched through the full-text index. On other databases, and for queries too
+short for trigrams, it falls back to a plain ORM lookup.
+
+Saving or deleting a user keeps the index in step (users.signals); bulk
+imports add their rows with index_new_patients().
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import User
+
+PATIENT_SEARCH_TABLE = 'users_patient_search'
+MIN_TERM_LENGTH = 3
+
+_PHONE_RE = re.compile(r'^[\d+()\-\s]+$')
+
+
+def normalize_phone(phone):
+    """Digits only, so '+998 (90) 123-45-67' and '998901234567' match."""
+    return re.sub(r'\D', '', phone or '')
+
+
+def search_available():
+    return connection.vendor == 'sqlite'
+
+
+def _row(user):
+    return (user.pk, user.first_name, user.last_name, user.username, normalize_phone(user.phone))
+
+
+def index_patient(user):
+    """Add or refresh a patient in the search index."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PATIENT_SEARCH_TABLE} WHERE rowid = %s", [user.pk])
+        cursor.execute(
+            f"INSERT INTO {PATIENT_SEARCH_TABLE} (rowid, first_name, last_name, username, phone) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            _row(user),
+        )
+
+
+def unindex_patient(user_id):
+    """Drop a user from the search index (deleted, or no longer a patient)."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PATIENT_SEARCH_TABLE} WHERE rowid = %s", [user_id])
+
+
+def index_new_patients(users):
+    """Add freshly created patients to the index with one executemany."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        _insert_rows(cursor, [_row(user) for user in users])
+
+
+def rebuild_index(batch_size=1000):
+    """Re-create the whole index from the users table. Returns the number of patients indexed."""
+    if not search_available():
+        return 0
+    patients = (
+        User.objects.filter(role=User.ROLE_PATIENT)
+        .only('id', 'first_name', 'last_name', 'username', 'phone')
+        .iterator(chunk_size=batch_size)
+    )
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PATIENT_SEARCH_TABLE}")
+        batch = []
+        for user in patients:
+            batch.append(_row(user))
+            if len(batch) >= batch_size:
+                count += _insert_rows(cursor, batch)
+                batch = []
+        count += _insert_rows(cursor, batch)
+    return count
+
+
+def _insert_rows(cursor, rows):
+    if rows:
+        cursor.executemany(
+            f"INSERT INTO {PATIENT_SEARCH_TABLE} (rowid, first_name, last_name, username, phone) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+    return len(rows)
+
+
+def _terms(query):
+    terms = []
+    for term in query.split():
+        if _PHONE_RE.match(term):
+            term = normalize_phone(term)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def _fts_query(terms):
+    # every term is a quoted substring; all of them must match
+    return ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _fallback_search(terms, limit):
+    patients = User.objects.filter(role=User.ROLE_PATIENT)
+    for term in terms:
+        patients = patients.filter(
+            Q(first_name__istartswith=term)
+            | Q(last_name__istartswith=term)
+            | Q(username__istartswith=term)
+            | Q(phone__contains=term)
+        )
+    return list(patients.order_by('-date_joined', '-id')[:limit])
+
+
+def search_patients(query, limit=10):
+    """Best matching patients for an as-you-type query, best first."""
+    terms = _terms(query or '')
+    if not terms:
+        return []
+    if not search_available() or any(len(term) < MIN_TERM_LENGTH for term in terms):
+        return _fallback_search(terms, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {PATIENT_SEARCH_TABLE} WHERE {PATIENT_SEARCH_TABLE} MATCH %s "
+            f"ORDER BY rank LIMIT %s",
+            [_fts_query(terms), limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    # a row left behind by a raw write must not leak a non-patient into the results
+    patients = User.objects.filter(role=User.ROLE_PATIENT).in_bulk(ids)
+    return [patients[pk] for pk in ids if pk in patients]
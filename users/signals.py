@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
+
+from .backends import user_cache_key
+from .models import User
+from .search import index_patient, unindex_patient
+
+# a save touching none of these leaves the search index as it is
+SEARCH_FIELDS = {'role', 'first_name', 'last_name', 'username', 'phone'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Drop the cached copy used by CachedModelBackend: right away, and again
+    after commit so another process cannot re-cache the old row meanwhile.
+    """
+    key = user_cache_key(instance.pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=User)
+def user_search_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the patient search index in step with the user's name, phone and role."""
+    if raw or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    if instance.role == User.ROLE_PATIENT:
+        index_patient(instance)
+    else:
+        unindex_patient(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_search_deleted(sender, instance, **kwargs):
+    unindex_patient(instance.pk)
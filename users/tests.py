@@ -1,3 +1,489 @@
-from django.test import TestCase
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now, localdate, make_aware
+
+from finance.models import Appointment, AppointmentService, Invoice
+from med_clinic.test_runner import in_another_process
+from service.models import Service
+from .backends import CachedModelBackend, user_cache_key
+from .forms import PatientRegistrationForm
+from .models import User, DoctorProfile, PatientProfile
+from .importing import import_patients
+from .search import rebuild_index, search_patients, unindex_patient
+from .views import get_patient_page
+
+
+class PatientPaginationTests(TestCase):
+    """Keyset pagination of the patient list on the manager dashboard."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+        joined = now()
+        # Pairs of patients share date_joined so the id tie-breaker is exercised
+        User.objects.bulk_create([
+            User(username=f'patient{i}', role=User.ROLE_PATIENT, date_joined=joined - timedelta(minutes=i // 2))
+            for i in range(25)
+        ])
+
+    def test_pages_cover_every_patient_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_patient_page(cursor, page_size=10)
+            seen.extend(p.pk for p in page)
+            if not cursor:
+                break
+
+        expected = list(
+            User.objects.filter(role=User.ROLE_PATIENT).order_by('-date_joined', '-id').values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursor_starts_from_the_top(self):
+        first, _ = get_patient_page(None, page_size=5)
+        page, _ = get_patient_page('garbage', page_size=5)
+        self.assertEqual(page, first)
+
+    def test_partial_returns_rows_and_next_cursor(self):
+        self.client.force_login(self.manager)
+        _, cursor = get_patient_page(None, page_size=20)
+
+        response = self.client.get(reverse('manager_dashboard'), {'partial': 1, 'cursor': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'users/_patient_rows.html')
+        self.assertEqual(response['X-Next-Cursor'], '')
+
+
+class CashierDashboardTests(TestCase):
+    """Filtered, paginated cashier dashboard."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashier = User.objects.create_user(username='cashier', password='pass', role=User.ROLE_CASHIER)
+        cls.invoices = {}
+        for name in ('alice', 'bob'):
+            user = User.objects.create_user(username=name, password='pass', role=User.ROLE_PATIENT, phone='+998901234567')
+            patient = PatientProfile.objects.create(user=user)
+            for status in (Invoice.STATUS_UNPAID, Invoice.STATUS_PAID):
+                appt = Appointment.objects.create(patient=patient)
+                cls.invoices[name, status] = Invoice.objects.create(
+                    appointment=appt, status=status, total_amount=Decimal('10.00')
+                )
+        # An unpaid invoice from last week stays out of the default view
+        old = cls.invoices['alice', Invoice.STATUS_UNPAID]
+        Invoice.objects.filter(pk=old.pk).update(created_at=now() - timedelta(days=7))
+
+    def setUp(self):
+        # rolled back test data must not be served from cached fragments
+        cache.clear()
+        self.client.force_login(self.cashier)
+
+    def test_default_view_is_unpaid_today(self):
+        response = self.client.get(reverse('cashier_dashboard'))
+
+        self.assertEqual(list(response.context['invoices']), [self.invoices['bob', Invoice.STATUS_UNPAID]])
+
+    def test_patient_filter(self):
+        response = self.client.get(reverse('cashier_dashboard'), {'patient': 'alic'})
+
+        self.assertEqual(
+            {invoice.pk for invoice in response.context['invoices']},
+            {self.invoices['alice', status].pk for status in (Invoice.STATUS_UNPAID, Invoice.STATUS_PAID)},
+        )
+
+    def test_query_count_is_bounded(self):
+        self.client.get(reverse('cashier_dashboard'))
+        # count and page; the session and the user come from the cache
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cashier_dashboard'), {'status': ''})
+
+
+class PatientSearchTests(TestCase):
+    """Full-text patient search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+        form = PatientRegistrationForm({
+            'first_name': 'Азиза', 'last_name': 'Каримова', 'phone': '+998901234567', 'birthday': '',
+        })
+        assert form.is_valid(), form.errors
+        cls.patient, _ = form.save()
+        User.objects.create_user(username='johnsmith', password='pass', role=User.ROLE_PATIENT, phone='+998911112233')
+
+    def test_registration_indexes_patient(self):
+        self.assertEqual(search_patients('карим'), [self.patient])
+        self.assertEqual(search_patients('азиза карим'), [self.patient])
+
+    def test_partial_phone_matches(self):
+        self.assertEqual(search_patients('90 123'), [self.patient])
+        self.assertEqual(search_patients('1234567'), [self.patient])
+
+    def test_short_query_falls_back_to_prefix_lookup(self):
+        self.assertEqual(search_patients('Аз'), [self.patient])
+
+    def test_rebuild_index_picks_up_other_patients(self):
+        unindex_patient(User.objects.get(username='johnsmith').pk)
+        self.assertEqual(search_patients('smith'), [])
+        rebuild_index()
+        self.assertEqual([p.username for p in search_patients('smith')], ['johnsmith'])
+
+    def test_edited_and_deleted_users_are_reindexed(self):
+        self.patient.phone = '+998935550011'
+        self.patient.save()
+        self.assertEqual(search_patients('1234567'), [])
+        self.assertEqual(search_patients('5550011'), [self.patient])
+
+        self.patient.delete()
+        self.assertEqual(search_patients('5550011'), [])
+
+    def test_only_patients_are_found(self):
+        john = User.objects.get(username='johnsmith')
+        # a bulk update sends no signals, so the index row stays behind
+        User.objects.filter(pk=john.pk).update(role=User.ROLE_MANAGER)
+        self.assertEqual(search_patients('smith'), [])
+
+        john.role = User.ROLE_DOCTOR
+        john.save()
+        User.objects.filter(pk=john.pk).update(role=User.ROLE_PATIENT)
+        self.assertEqual(search_patients('smith'), [])
+
+    def test_endpoint(self):
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('patient_search'), {'q': 'каримова'})
+
+        self.assertEqual([r['id'] for r in response.json()['results']], [self.patient.id])
+
+    def test_repeated_query_is_not_modified(self):
+        self.client.force_login(self.manager)
+        url = reverse('patient_search')
+
+        etag = self.client.get(url, {'q': 'каримова'})['ETag']
+        response = self.client.get(url, {'q': 'каримова'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(url, {'q': 'smith'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class BatchApprovalTests(TestCase):
+    """Approving many invoices in one request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cashier = User.objects.create_user(username='cashier', password='pass', role=User.ROLE_CASHIER)
+        user = User.objects.create_user(username='patient', password='pass', role=User.ROLE_PATIENT)
+        patient = PatientProfile.objects.create(user=user)
+        cls.invoices = [
+            Invoice.objects.create(appointment=Appointment.objects.create(patient=patient))
+            for _ in range(3)
+        ]
+        Invoice.objects.filter(pk=cls.invoices[0].pk).update(status=Invoice.STATUS_PAID)
+
+    def test_pays_only_unpaid_selected_invoices(self):
+        self.client.force_login(self.cashier)
+        next_url = reverse('cashier_dashboard') + '?status='
+
+        response = self.client.post(reverse('approve_payments'), {
+            'invoice_ids': [invoice.pk for invoice in self.invoices[:2]],
+            'next': next_url,
+        })
+
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        statuses = dict(Invoice.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.invoices[1].pk], Invoice.STATUS_PAID)
+        self.assertEqual(statuses[self.invoices[2].pk], Invoice.STATUS_UNPAID)
+        self.assertEqual(
+            Invoice.objects.filter(confirmed_by=self.cashier).values_list('pk', flat=True).get(),
+            self.invoices[1].pk,
+        )
+
+    def test_foreign_next_url_is_ignored(self):
+        self.client.force_login(self.cashier)
+
+        response = self.client.post(reverse('approve_payments'), {
+            'invoice_ids': [self.invoices[2].pk], 'next': 'https://evil.example/',
+        })
+
+        self.assertRedirects(response, reverse('cashier_dashboard'), fetch_redirect_response=False)
+
+
+def _drop_cached_user(user_id):
+    # what users.signals does in the worker that saved the user
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedAuthTests(TestCase):
+    """Session and user served from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role=User.ROLE_MANAGER)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('home_dashboard'))
+
+    def test_role_check_needs_no_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('add_doctor'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_role_change_is_seen_at_once(self):
+        self.manager.role = User.ROLE_PATIENT
+        self.manager.save()
+
+        self.assertEqual(self.client.get(reverse('add_doctor')).status_code, 302)
+
+    def test_password_change_ends_other_sessions(self):
+        self.manager.set_password('new-pass')
+        self.manager.save()
+
+        self.assertFalse(self.client.get(reverse('home_dashboard')).wsgi_request.user.is_authenticated)
+
+    def test_change_in_another_worker_is_seen(self):
+        in_another_process(_drop_cached_user, self.manager.pk)
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse('add_doctor'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_not_trusted(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.manager.pk)
+
+        with self.assertNumQueries(1):
+            backend.get_user(self.manager.pk)
+
+
+class PatientImportTests(TestCase):
+    """Bulk patient import."""
+
+    CSV = (
+        'first_name,last_name,phone,birthday\n'
+        'Anvar,Aliyev,+998901112233,1990-05-01\n'
+        'Anvar,Aliyev,+998901112244,\n'
+        'Dilnoza,Karimova,+998901112255,not-a-date\n'
+        ',Rahimov,,\n'
+        'Madina,Yusupova,,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='anvaraliyev', password='pass', role=User.ROLE_PATIENT)
+
+    def _import(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'patients.csv'
+            path.write_text(self.CSV, encoding='utf-8')
+            out, err = StringIO(), StringIO()
+            call_command('import_patients', str(path), *args, stdout=out, stderr=err, **options)
+            return out.getvalue(), err.getvalue()
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        out, err = self._import()
+
+        self.assertIn('Created 3 patients, skipped 2 invalid rows.', out)
+        self.assertIn('Row 3: birthday:', err)
+        self.assertIn('Row 4:', err)
+        self.assertEqual(PatientProfile.objects.count(), 3)
+
+    def test_username_collisions_get_suffixes(self):
+        self._import()
+
+        self.assertEqual(
+            sorted(User.objects.filter(first_name='Anvar').values_list('username', flat=True)),
+            ['anvaraliyev2', 'anvaraliyev3'],
+        )
+        self.assertEqual(search_patients('yusupova')[0].username, 'madinayusupova')
+
+    def test_queries_do_not_depend_on_row_count(self):
+        rows = [{'first_name': f'Name{i}', 'last_name': 'Test'} for i in range(50)]
+
+        # lookup + savepoint, users, profiles, search index, release
+        with self.assertNumQueries(6):
+            result = import_patients(rows)
+        self.assertEqual(len(result.created), 50)
+        self.assertFalse(result.created[0].has_usable_password())
+
+    def test_generated_passwords_are_hashed_in_a_pool(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out_path = Path(tmpdir) / 'passwords.csv'
+            self._import(passwords='generate', passwords_out=str(out_path), workers=2)
+            with open(out_path, encoding='utf-8') as f:
+                credentials = list(csv.DictReader(f))
+
+        self.assertEqual(len(credentials), 3)
+        user = User.objects.get(username=credentials[0]['username'])
+        self.assertTrue(user.check_password(credentials[0]['password']))
+
+    def test_dry_run_creates_nothing(self):
+        out, _ = self._import(dry_run=True)
+
+        self.assertIn('Would create 3 patients', out)
+        self.assertEqual(PatientProfile.objects.count(), 0)
+
+
+class DoctorWorklistTests(TestCase):
+    """The doctor's bookings for the day and the changes-since poll."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_user = User.objects.create_user(username='doctor', password='pass', role=User.ROLE_DOCTOR)
+        cls.doctor = DoctorProfile.objects.create(user=cls.doctor_user)
+        other = DoctorProfile.objects.create(
+            user=User.objects.create_user(username='other', password='pass', role=User.ROLE_DOCTOR)
+        )
+        cls.service = Service.objects.create(name='Консультация', price=Decimal('100.00'))
+        cls.day = localdate()
+        cls.items = [
+            cls._book(f'patient{i}', cls.doctor, hour)
+            for i, hour in enumerate((15, 9, 11))
+        ]
+        cls._book('other_patient', other, 10)
+        cls._book('tomorrow', cls.doctor, 9, days=1)
+
+    @classmethod
+    def _book(cls, username, doctor, hour, days=0):
+        user = User.objects.create_user(username=username, password='pass', role=User.ROLE_PATIENT, first_name=username)
+        appt = Appointment.objects.create(patient=PatientProfile.objects.create(user=user))
+        starts_at = make_aware(datetime.combine(cls.day + timedelta(days=days), time(hour)))
+        return AppointmentService.objects.create(
+            appointment=appt, service=cls.service, doctor=doctor, price=cls.service.price,
+            starts_at=starts_at, ends_at=starts_at + timedelta(minutes=30),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.doctor_user)
+
+    def _changes(self, since):
+        return self.client.get(
+            reverse('doctor_worklist_changes'), {'date': self.day.isoformat(), 'since': since}
+        ).json()
+
+    def test_dashboard_lists_the_days_bookings_in_one_query(self):
+        self.client.get(reverse('doctor_dashboard'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('doctor_dashboard'))
+
+        self.assertEqual(
+            [item['patient'] for item in response.context['items']],
+            ['patient1', 'patient2', 'patient0'],
+        )
+        self.assertContains(response, '09:00–09:30')
+
+    def test_booking_without_start_time_is_listed_at_the_appointment_date(self):
+        user = User.objects.create_user(username='legacy', password='pass', role=User.ROLE_PATIENT, first_name='legacy')
+        appt = Appointment.objects.create(
+            patient=PatientProfile.objects.create(user=user),
+            appointment_date=make_aware(datetime.combine(self.day, time(10))),
+        )
+        # a row from before starts_at/ends_at existed
+        AppointmentService.objects.create(appointment=appt, service=self.service, doctor=self.doctor, price=self.service.price)
+
+        response = self.client.get(reverse('doctor_dashboard'))
+
+        self.assertEqual(
+            [(item['patient'], item['start']) for item in response.context['items']],
+            [('patient1', '09:00'), ('legacy', '10:00'), ('patient2', '11:00'), ('patient0', '15:00')],
+        )
+
+    def test_poll_returns_only_changes_and_current_ids(self):
+        cursor = self.client.get(reverse('doctor_dashboard')).context['cursor']
+        data = self._changes(cursor)
+        self.assertEqual(data['ids'], [self.items[1].pk, self.items[2].pk, self.items[0].pk])
+
+        AppointmentService.objects.filter(pk__in=[item.pk for item in self.items]).update(
+            updated_at=now() - timedelta(hours=1)
+        )
+        moved = self.items[0]
+        moved.starts_at -= timedelta(hours=7)
+        moved.save()
+        self.items[2].delete()
+
+        data = self._changes(data['cursor'])
+
+        self.assertEqual([item['id'] for item in data['changed']], [moved.pk])
+        self.assertEqual(data['changed'][0]['start'], '08:00')
+        self.assertEqual(data['ids'], [moved.pk, self.items[1].pk])
+
+    def test_invalid_since_is_rejected(self):
+        response = self.client.get(reverse('doctor_worklist_changes'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PatientHistoryTests(TestCase):
+    """The patient's visit history: fixed query count, only their own visits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient_user = User.objects.create_user(username='patient', password='pass', role=User.ROLE_PATIENT)
+        cls.patient = PatientProfile.objects.create(user=cls.patient_user)
+        other = PatientProfile.objects.create(
+            user=User.objects.create_user(username='other', password='pass', role=User.ROLE_PATIENT)
+        )
+        doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(username='doctor', password='pass', role=User.ROLE_DOCTOR, last_name='Назаров')
+        )
+        cls.service = Service.objects.create(name='Консультация', price=Decimal('100.00'))
+        cls.doctor = doctor
+        cls._visit(other)
+
+    @classmethod
+    def _visit(cls, patient, days_ago=0, paid=False):
+        appt = Appointment.objects.create(patient=patient, appointment_date=now() - timedelta(days=days_ago))
+        for _ in range(2):
+            AppointmentService.objects.create(
+                appointment=appt, service=cls.service, doctor=cls.doctor, price=cls.service.price
+            )
+        Invoice.objects.create(
+            appointment=appt, total_amount=Decimal('200.00'),
+            status=Invoice.STATUS_PAID if paid else Invoice.STATUS_UNPAID,
+        )
+        return appt
+
+    def _queries(self):
+        self.client.get(reverse('patient_dashboard'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('patient_dashboard'))
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_visits(self):
+        self.client.force_login(self.patient_user)
+        self._visit(self.patient, paid=True)
+        _, few = self._queries()
+
+        for days_ago in range(1, 25):
+            self._visit(self.patient, days_ago)
+        response, many = self._queries()
+
+        # count, page of appointments with invoices, their services
+        self.assertEqual(few, many)
+        self.assertEqual(many, 3)
+        self.assertEqual(len(response.context['appointments']), 10)
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+
+    def test_lists_own_visits_newest_first(self):
+        old = self._visit(self.patient, days_ago=3, paid=True)
+        new = self._visit(self.patient)
+        self.client.force_login(self.patient_user)
+
+        response = self.client.get(reverse('patient_dashboard'))
+
+        self.assertEqual(list(response.context['appointments']), [new, old])
+        self.assertContains(response, 'Назаров', count=4)
+        self.assertContains(response, 'Оплачено')
+        self.assertContains(response, 'Ожидает оплаты')
@@ -10,9 +10,11 @@ urlpatterns = [
     # Manager-specific paths
     path('add-doctor/', views.add_doctor, name='add_doctor'),
     path('manager/dashboard/', views.manager_dashboard, name='manager_dashboard'),
+    path('manager/patients/search/', views.patient_search, name='patient_search'),
 
     # Doctor-specific paths
     path('doctor/dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
+    path('doctor/worklist/changes/', views.doctor_worklist_changes, name='doctor_worklist_changes'),
 
     # Patient-specific paths
     path('patient/dashboard/', views.patient_dashboard, name='patient_dashboard'),
@@ -21,5 +23,6 @@ urlpatterns = [
     path('', views.home_dashboard, name='home_dashboard'),
     path("cashier/dashboard/", views.cashier_dashboard, name="cashier_dashboard"),
     path("cashier/invoices/<int:invoice_id>/approve/", views.approve_payment, name="approve_payment"),
+    path("cashier/invoices/approve/", views.approve_payments, name="approve_payments"),
 ]
 
@@ -1,13 +1,26 @@
 # your_app_name/views.py
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST, conditional_page
+from django.db import transaction
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.utils.timezone import now
+from django.utils.timezone import now, localdate, localtime, make_aware, is_naive
+from django.core.paginator import Paginator
+from django.db.models import Q
+from datetime import datetime, date, timedelta
 
 from .forms import UserLoginForm, ManagerRegistrationForm, DoctorRegistrationForm, PatientRegistrationForm
-from .models import User, DoctorProfile, PatientProfile
-from finance.models import Invoice
+from .models import User, DoctorProfile, PatientProfile, display_name
+from .search import search_patients
+from med_clinic.aio import gather_reads, apaginate
+from finance.models import Appointment, Invoice, AppointmentService
+from finance.forms import InvoiceFilterForm
 
 # --- Custom Decorators for Role-Based Access ---
 def manager_required(function=None, redirect_field_name=None, login_url='login'):
@@ -159,6 +172,45 @@ def home_dashboard(request):
 
 # --- Role-Specific Dashboard Views ---
 
+PATIENTS_PAGE_SIZE = 50
+PATIENT_SEARCH_LIMIT = 10
+
+
+def _encode_patient_cursor(patient):
+    """Cursor pointing just after the given patient in the (-date_joined, -id) order."""
+    return f"{patient.date_joined.isoformat()}_{patient.pk}"
+
+
+def _decode_patient_cursor(cursor):
+    """Returns (date_joined, id) from a cursor string, or None if it is malformed."""
+    try:
+        joined, pk = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(joined), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def get_patient_page(cursor=None, page_size=PATIENTS_PAGE_SIZE):
+    """
+    Returns one page of patients (newest first) and the cursor of the next page.
+    Uses keyset pagination on (date_joined, id), so every page costs the same
+    regardless of how deep into the list it is.
+    """
+    patients = User.objects.filter(role=User.ROLE_PATIENT).order_by('-date_joined', '-id')
+
+    position = _decode_patient_cursor(cursor) if cursor else None
+    if position:
+        joined, pk = position
+        patients = patients.filter(Q(date_joined__lt=joined) | Q(date_joined=joined, id__lt=pk))
+
+    page = list(patients[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = _encode_patient_cursor(page[-1])
+    return page, next_cursor
+
+
 @manager_required
 def manager_dashboard(request):
     """
@@ -179,31 +231,151 @@ def manager_dashboard(request):
                 messages.error(request, 'Failed to add patient. Please correct the errors below.')
                 print(f"Patient form errors: {patient_form.errors}")
 
-    # Fetch all patients and their profiles, ordered by the user's creation date
-    patients = User.objects.filter(role=User.ROLE_PATIENT).order_by('-date_joined')
+    patients, next_cursor = get_patient_page(request.GET.get('cursor'))
+
+    # Incremental loading: the table asks only for the next page of rows
+    if request.GET.get('partial'):
+        response = render(request, 'users/_patient_rows.html', {'patients': patients})
+        response['X-Next-Cursor'] = next_cursor or ''
+        return response
 
     context = {
         'message': "Welcome, Manager! Here's your dashboard.",
         'patient_form': PatientRegistrationForm(),  # We re-instantiate the form for GET requests
         'patients': patients,
+        'next_cursor': next_cursor,
     }
     return render(request, 'users/manager_dashboard.html', context)
 
 
+@manager_required
+@cache_control(private=True, no_cache=True)
+@conditional_page
+def patient_search(request):
+    """
+    As-you-type patient search for the manager dashboard (JSON).
+
+    The response carries an ETag of its content, so a repeated query is
+    answered with 304 Not Modified and the browser reuses its copy.
+    """
+    patients = search_patients(request.GET.get('q', ''), limit=PATIENT_SEARCH_LIMIT)
+    results = [
+        {
+            'id': patient.id,
+            'first_name': patient.first_name,
+            'last_name': patient.last_name,
+            'username': patient.username,
+            'phone': patient.phone,
+            'url': reverse('appointment_create', args=[patient.id]),
+        }
+        for patient in patients
+    ]
+    return JsonResponse({'results': results})
+
+
+# a booking saved just before a poll may commit just after it; polls overlap
+# by this much and the page replaces rows by id, so it is never missed
+WORKLIST_POLL_OVERLAP = timedelta(seconds=5)
+
+
+def _worklist_day(request):
+    """Day from ?date=YYYY-MM-DD (today by default), None if it is invalid."""
+    try:
+        return date.fromisoformat(request.GET['date']) if request.GET.get('date') else localdate()
+    except ValueError:
+        return None
+
+
+def _worklist_cursor(moment):
+    return (moment - WORKLIST_POLL_OVERLAP).isoformat()
+
+
+def _worklist_item(item):
+    patient = item.appointment.patient.user
+    return {
+        'id': item.id,
+        'appointment': item.appointment_id,
+        'start': localtime(item.scheduled_at).strftime('%H:%M'),
+        'end': localtime(item.ends_at).strftime('%H:%M') if item.ends_at else '',
+        'patient': display_name(patient),
+        'phone': patient.phone,
+        'service': item.service.name,
+    }
+
+
 @doctor_required
-def doctor_dashboard(request):
+async def doctor_dashboard(request):
     """
-    Dashboard for Doctor role.
+    Dashboard for Doctor role: the doctor's bookings for the day (?date=YYYY-MM-DD).
+    The page then polls doctor_worklist_changes instead of reloading.
     """
-    return render(request, 'users/doctor_dashboard.html', {'message': "Welcome, Doctor! Here's your dashboard."})
+    day = _worklist_day(request) or localdate()
+    moment = now()
+    worklist = AppointmentService.objects.worklist(await request.auser(), day)
+    items = [_worklist_item(item) async for item in worklist]
+    # the template reads request.user and the session lazily, which may query the database
+    return await sync_to_async(render)(request, 'users/doctor_dashboard.html', {
+        'day': day,
+        'items': items,
+        'cursor': _worklist_cursor(moment),
+    })
+
+
+@doctor_required
+@cache_control(private=True, no_store=True)
+async def doctor_worklist_changes(request):
+    """
+    Bookings of the day added or changed since ?since=<cursor> (JSON), and the
+    ids of all bookings of the day so the page can drop the removed ones.
+    The returned cursor is the since of the next poll.
+    """
+    day = _worklist_day(request)
+    try:
+        since = datetime.fromisoformat(request.GET.get('since', ''))
+    except ValueError:
+        since = None
+    if day is None or since is None:
+        return JsonResponse({'error': 'Invalid date or since.'}, status=400)
+    if is_naive(since):
+        since = make_aware(since)
+
+    moment = now()
+    worklist = AppointmentService.objects.worklist(await request.auser(), day)
+    # the two reads are independent and run concurrently
+    changed, ids = await gather_reads(
+        lambda: [_worklist_item(item) for item in worklist.filter(updated_at__gt=since)],
+        lambda: list(worklist.values_list('id', flat=True)),
+    )
+    return JsonResponse({
+        'date': day.isoformat(),
+        'cursor': _worklist_cursor(moment),
+        'changed': changed,
+        'ids': ids,
+    })
+
+
+HISTORY_PAGE_SIZE = 10
 
 
 @patient_required
-def patient_dashboard(request):
+async def patient_dashboard(request):
     """
-    Dashboard for Patient role.
+    Dashboard for Patient role: the patient's visits, newest first, with their
+    services, doctors and invoice status. A page takes the same number of
+    queries however many visits the patient has had; the count and the page
+    are read concurrently.
     """
-    return render(request, 'users/patient_dashboard.html', {'message': "Welcome, Patient! Here's your dashboard."})
+    appointments = (
+        Appointment.objects
+        .filter(patient__user=await request.auser())
+        .with_details()
+        .order_by('-appointment_date', '-id')
+    )
+    page = await apaginate(appointments, HISTORY_PAGE_SIZE, request.GET.get('page'))
+    return await sync_to_async(render)(request, 'users/patient_dashboard.html', {
+        'appointments': page.object_list,
+        'page_obj': page,
+    })
 
 
 def cashier_required(function=None, redirect_field_name=None, login_url='login'):
@@ -217,29 +389,69 @@ def cashier_required(function=None, redirect_field_name=None, login_url='login')
     return actual_decorator
 
 
+CASHIER_PAGE_SIZE = 25
+
+
 @login_required
 @cashier_required
 def cashier_dashboard(request):
-    """Панель кассира: список счетов, по умолчанию — все, неоплаченные сверху."""
+    """Панель кассира: по умолчанию — неоплаченные счета за сегодня, с фильтрами и постранично."""
+    if request.GET.keys() - {"page"}:
+        filter_form = InvoiceFilterForm(request.GET)
+    else:
+        today = localdate()
+        filter_form = InvoiceFilterForm({"status": Invoice.STATUS_UNPAID, "date_from": today, "date_to": today})
+
     invoices = (
         Invoice.objects
-        .select_related("appointment__patient__user")
-        .order_by("status", "-created_at")  # сначала ожидают оплаты, потом оплаченные
+        .select_related("appointment__patient__user", "confirmed_by")
+        .order_by("status", "-created_at", "-id")  # сначала ожидают оплаты, потом оплаченные
     )
-    return render(request, "users/cashier_dashboard.html", {"invoices": invoices})
+    invoices = filter_form.filter(invoices)
+    page = Paginator(invoices, CASHIER_PAGE_SIZE).get_page(request.GET.get("page"))
+
+    filters = request.GET.copy()
+    filters.pop("page", None)
+
+    return render(request, "users/cashier_dashboard.html", {
+        "invoices": page.object_list,
+        "page_obj": page,
+        "filter_form": filter_form,
+        "filters": filters.urlencode(),
+    })
 
 
 @login_required
 @cashier_required
+@require_POST
 def approve_payment(request, invoice_id):
     """Подтвердить оплату счёта."""
-    invoice = get_object_or_404(Invoice, id=invoice_id)
-    if invoice.status == "оплачено":
-        messages.warning(request, f"Счёт #{invoice.id} уже оплачен.")
+    if Invoice.objects.filter(id=invoice_id).mark_paid(request.user):
+        messages.success(request, f"Счёт #{invoice_id} успешно оплачен.")
+    else:
+        get_object_or_404(Invoice, id=invoice_id)
+        messages.warning(request, f"Счёт #{invoice_id} уже оплачен.")
+    return _redirect_back(request, 'cashier_dashboard')
+
+
+@login_required
+@cashier_required
+@require_POST
+def approve_payments(request):
+    """Подтвердить оплату нескольких выбранных счетов одной транзакцией."""
+    invoice_ids = [int(pk) for pk in request.POST.getlist('invoice_ids') if pk.isdigit()]
+    if not invoice_ids:
+        messages.warning(request, "Не выбрано ни одного счёта.")
     else:
-        invoice.status = "оплачено"
-        invoice.paid_at = now()
-        invoice.confirmed_by = request.user
-        invoice.save()
-        messages.success(request, f"Счёт #{invoice.id} успешно оплачен.")
-    return redirect("cashier_dashboard")
\ No newline at end of file
+        with transaction.atomic():
+            paid = Invoice.objects.filter(id__in=invoice_ids).mark_paid(request.user)
+        messages.success(request, f"Оплачено счетов: {paid} из {len(invoice_ids)}.")
+    return _redirect_back(request, 'cashier_dashboard')
+
+
+def _redirect_back(request, default):
+    """Return to the page (with its filters) the form was posted from."""
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect(default)